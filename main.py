@@ -10,47 +10,70 @@ NOTE: 'dist' directory is for executables, they are not part of the project dire
 To run this project, navigate to the dist/main folder, and double-click on main.exe
 
 --+ Classes +--
-Game() - The game class is the main object in the program, managing the update, rendering, and events of game objects.
+Game(headless, save_file) - The game class is the main object in the program, managing the update, rendering, and events of game objects.
 """
 # --------------------------------------------------------------------------------
 # External impots
-import pygame, sys, math
+import pygame, sys, os
 
 # Internal imports
-from scripts.utils import Settings, Telemetry, DisplayPositions, GameManager
+from scripts.utils import Settings, Telemetry, DisplayPositions, GameManager, convert_images, draw_queue, animation_clock, render_text
 from scripts.entities import Player
 from scripts.assetMap import AssetMap
 from scripts.newTilemap import Tilemap
+from scripts.profiler import Profiler
+from scripts.presenter import Presenter
+from scripts.upscaler import Upscaler
+
+MAX_FRAME_TIME = 0.25 # Longest frame that is fully simulated, so a slow frame can not stall the game
 # --------------------------------------------------------------------------------
 
 class Game():
     """The game class is the main object in the program, managing the update, rendering, and events of game objects."""
-    def __init__(self):
-        """Initiate game object with attributes for game"""
+    def __init__(self, headless=False, save_file='data/saves/trial_chambers'):
+        """Initiate game object with attributes for game, a headless game has no window or sound (for benchmarks)"""
+        if headless:
+            # Use SDL's dummy drivers, so the game runs without a display or audio device
+            os.environ["SDL_VIDEODRIVER"] = "dummy"
+            os.environ["SDL_AUDIODRIVER"] = "dummy"
         # Initialize pygame
         pygame.init()
 
-        self.settings = Settings() # Initiate settings class
+        self.settings = Settings(headless) # Initiate settings class
 
         # Create seperate display and screen elements to be able to easily scale to any screen size
         self.display = pygame.Surface((384, 216)) # Only write to this surface 
-        self.screen = pygame.display.set_mode(self.settings.screen_size) # Set screen size
+        if self.settings.render_mode == 'vsync':
+            try:
+                self.screen = pygame.display.set_mode(self.settings.screen_size, vsync=1) # Set screen size, and wait for vsync
+            except pygame.error: # Vsync is not supported by this display
+                self.screen = pygame.display.set_mode(self.settings.screen_size)
+        else:
+            self.screen = pygame.display.set_mode(self.settings.screen_size) # Set screen size
+        convert_images() # Convert any images loaded before the display existed (assets are loaded when first used)
 
         self.keybinds = self.settings.keybinds # gets a dictionary for game keybinds
         self.sWidth = self.screen.get_width()
         self.sHeight = self.screen.get_height()
-        self.font_screen = pygame.Surface(self.settings.screen_size, pygame.SRCALPHA)
+        self.font_screen = pygame.Surface(self.settings.screen_size, pygame.SRCALPHA) # Kept between frames, the HUD redraws the parts that change
+        self.font_screen.fill((0, 0, 0, 0))
+        draw_queue.set_targets(self.display) # Drawing to the display is queued, and done in layer order each frame
+        # The font screen is not a target: the HUD text is drawn onto a scratch surface that is cropped right away,
+        # and the GUIManager composites it onto the font screen itself, so text has to be drawn immediately
 
         self.assetMap = AssetMap()
 
         self.tilemap = Tilemap(self.assetMap, 32)
+        # Enemies in view think every step, within the time budget
+        self.tilemap.aiScheduler.budget = self.settings.ai_budget / 1000
+        self.tilemap.aiScheduler.far_interval = max(1, self.settings.ai_far_interval)
+        self.tilemap.aiScheduler.view_size = self.display.get_size()
         self.trash_collected = 0
         self.recyclables_collected = 0
         self.total_trash = 10
         self.total_recyclables = 10
-        self.font = pygame.font.Font('freesansbold.ttf', 12)
-        self.trash_font = self.font.render(f"0", True, (255, 250, 250))
-        self.recyclables_text = self.font.render(f"0", True, (255, 250, 250))
+        self.trash_font = render_text("0", 12)
+        self.recyclables_text = render_text("0", 12)
         
 
         self.telemetry = Telemetry(self.settings.telemetry)
@@ -63,20 +86,21 @@ class Game():
         }
 
         self.scroll = [0 , 0]
+        self.prev_scroll = [0, 0] # Scroll before the last simulation step, used to interpolate rendering
 
-        # Determine the largest 16:9 ratio that can fit in the screen for the display size
+        # Determine the size the display is scaled to on the screen (the largest 16:9 size, or whole number scale, that fits)
         # This method allows the program to automatically scale the game to any screen size
-        if (self.sWidth < self.sHeight or self.sWidth == self.sHeight):
-            self.dWidth = self.sWidth - (self.sWidth % 16)
-            self.dHeight = math.trunc(self.dWidth * (9/16))
-        else:
-            self.dHeight = self.sHeight - (self.sHeight % 9)
-            self.dWidth = math.trunc(self.dHeight * (16/9)) 
-
-        self.scale = ((self.screen.get_width() / self.display.get_width()), self.screen.get_height() / self.display.get_height())
+        self.upscaler = Upscaler(self.display, (self.sWidth, self.sHeight), self.settings.upscale)
+        self.dWidth, self.dHeight = self.upscaler.dest.size
+
+        self.scale = self.upscaler.scale
+        # Scales the display onto the screen, and finds the parts of the screen that changed
+        self.presenter = Presenter(self.screen, self.display, self.font_screen, self.upscaler)
+        self.update_rects = None # Rects of the screen to update after rendering, None for the whole screen
+        self.profiler = Profiler(self.settings.profiler, self.settings.profiler_trace, self.scale[1])
         self.dPos = DisplayPositions((self.display.get_width(), self.display.get_height()))
         
-        self.gameManager = GameManager('data/saves/trial_chambers', self.tilemap, self)
+        self.gameManager = GameManager(save_file, self.tilemap, self)
         self.player = Player(self, (128, 64), (32, 32), (10, 20), self.gameManager)
         
         self.clock = pygame.time.Clock() # Create the game clock
@@ -84,15 +108,30 @@ class Game():
     def test(self):
         pass
 
+    def mouse_pos(self, pos=None):
+        """Returns the mouse position (or pos) relative to the top left of the scaled display"""
+        if pos == None:
+            pos = pygame.mouse.get_pos()
+        return (pos[0] - self.upscaler.dest.x, pos[1] - self.upscaler.dest.y)
+
     def update_trash(self):
-        self.trash_font = self.font.render(f"{self.trash_collected}", True, (255, 250, 250))
-        self.recyclables_text = self.font.render(f"{self.recyclables_collected}", True, (255, 250, 250))
+        self.trash_font = render_text(f"{self.trash_collected}", 12)
+        self.recyclables_text = render_text(f"{self.recyclables_collected}", 12)
 
     def run(self):
-        """Main game loop, handels updates and most game processes"""  
+        """Main game loop, handels events, runs the simulation at a fixed rate, and renders"""  
+        step = 1 / self.settings.simulation_rate # Seconds simulated by each update
+        accumulator = 0 # Time that has passed, but has not been simulated yet
+        frame_time = 0
         while True:
+            self.profiler.begin_frame()
             for event in pygame.event.get(): # Chack pygame events
+                if event.type in (pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP, pygame.MOUSEMOTION):
+                    # Make mouse positions relative to the scaled display, which can be centered on the screen
+                    event = pygame.event.Event(event.type, dict(event.dict, pos=self.mouse_pos(event.pos)))
                 if event.type == pygame.QUIT: # Check if the X on the window was clicked
+                    self.profiler.save_trace()
+                    self.gameManager.journal.close() # Finish writing the saved progress
                     pygame.quit()
                     sys.exit()
                 if event.type == pygame.KEYDOWN: # Check for buttons that were pressed
@@ -115,39 +154,90 @@ class Game():
                     if event.key == self.keybinds["right"]: # Check for the right button being released
                         self.movement['right'] = False
 
+                if event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED, pygame.WINDOWRESTORED):
+                    self.presenter.invalidate() # The window was covered or minimized, draw all of it again
+
                 self.player.check_events(event)
-            
-            # Create scroll offsets to have camera 'lag' behind the player for more fluid movement
-            self.scroll[0] += (self.player.rect().centerx - self.display.get_width() / 2 - self.scroll[0]) / 5 # Smaller the last value (5), the less the lag 
-            self.scroll[1] += (self.player.rect().centery - self.display.get_height() / 2 - self.scroll[1]) / 5 # Smaller the last value (5), the less the lag 
-            render_scroll = (int(self.scroll[0]), int(self.scroll[1]))
-
-            self.screen.fill((20, 20, 20))
-            self.display.fill((30, 30, 30))
-            self.font_screen.fill((0, 0, 0, 0))
-            self.font_screen.convert_alpha()
-
-            # Render the tilemap
-            self.tilemap.render(self.display, render_scroll)
-
-            # Update movement and render player (and HUD elements)
-            self.player.update(**self.movement)
-            # Update enemies
-            self.tilemap.enemyManager.update(self.player)
-            # Render enemies
-            self.tilemap.enemyManager.render(self.display, render_scroll)
-            self.player.render(self.display, render_scroll)
-
-            # Scale the display surface to best fit the screen *TODO This system does not work for taller displays* 
-            self.screen.blit(pygame.transform.scale( self.display, (self.dWidth, self.dHeight) ), 
-                             ((self.sWidth/2)-(self.dWidth/2) , (self.sHeight/2)-(self.dHeight/2)))
-            self.screen.blit(self.font_screen, (0, 0)) # Render any font ontop at full resolution
+                self.profiler.check_events(event)
+            self.profiler.mark('events')
+
+            # Run as many fixed simulation steps as the time that passed needs, rendering is done once per frame
+            accumulator += min(frame_time, MAX_FRAME_TIME)
+            while accumulator >= step:
+                self.update()
+                accumulator -= step
+            self.render(accumulator / step)
 
             # Update Telemetry data
             self.telemetry.update() # update telemetry data
             # Update the display with data
-            pygame.display.update() # Refresh the display
+            pygame.display.update(self.update_rects) # Refresh the parts of the display that changed
+            self.profiler.mark('present')
+            self.profiler.end_frame()
             
-            self.clock.tick(60) # Limit FPS to 60
-
-Game().run() # Initialize and run the game
\ No newline at end of file
+            # Limit FPS (when capped), and move animations forward by the time the frame took
+            if self.settings.render_mode == 'capped':
+                frame_time = self.clock.tick(self.settings.max_fps) / 1000
+            else:
+                frame_time = self.clock.tick() / 1000
+            animation_clock.update(frame_time)
+
+    def update(self):
+        """Run one simulation step"""
+        # Store positions, so rendering can interpolate between this step and the next
+        self.prev_scroll = self.scroll.copy()
+        self.player.store_pos()
+        self.player.projectiles.store_positions()
+        self.tilemap.enemyManager.store_positions()
+
+        # Create scroll offsets to have camera 'lag' behind the player for more fluid movement
+        self.scroll[0] += (self.player.rect().centerx - self.display.get_width() / 2 - self.scroll[0]) / 5 # Smaller the last value (5), the less the lag 
+        self.scroll[1] += (self.player.rect().centery - self.display.get_height() / 2 - self.scroll[1]) / 5 # Smaller the last value (5), the less the lag 
+
+        # Update tile timers and room state checks
+        self.tilemap.update()
+        self.profiler.mark('tiles')
+        # Update movement of the player (and HUD elements)
+        self.player.update(**self.movement)
+        self.profiler.mark('player')
+        # Update enemies
+        self.tilemap.enemyManager.update(self.player)
+        self.profiler.mark('enemies')
+
+    def render(self, alpha):
+        """Render a frame, alpha of the way from the previous simulation step to the current one"""
+        render_scroll = (int(self.prev_scroll[0] + (self.scroll[0] - self.prev_scroll[0]) * alpha),
+                         int(self.prev_scroll[1] + (self.scroll[1] - self.prev_scroll[1]) * alpha))
+
+        self.display.fill((30, 30, 30))
+
+        self.profiler.mark('clear')
+
+        # Render the tilemap
+        self.tilemap.render(self.display, render_scroll)
+        self.profiler.mark('tilemap render')
+        # Render enemies, then the player
+        self.tilemap.enemyManager.render(self.display, render_scroll, alpha)
+        self.player.render(self.display, render_scroll, alpha)
+        self.profiler.mark('entity render')
+        # Render the HUD elements (the profiler overlay is cleared first, so the HUD text under it is drawn again)
+        self.player.hud.redraw(self.profiler.clear(self.font_screen))
+        self.player.render_hud(self.display)
+        self.profiler.mark('hud render')
+        # Draw everything queued this frame, in layer order
+        draw_queue.flush()
+        self.profiler.mark('draw')
+
+        # Profiler overlay on the font screen, when it is turned on
+        dirty_rects = list(self.player.hud.dirty_rects)
+        overlay = self.profiler.render(self.font_screen, self.telemetry, self.tilemap.aiScheduler.stats())
+        if overlay != None:
+            dirty_rects.append(overlay)
+
+        # Scale the display surface to best fit the screen, with the font ontop at full resolution (only the parts that changed)
+        # *TODO This system does not work for taller displays* 
+        self.update_rects = self.presenter.present(dirty_rects)
+        self.profiler.mark('scaling')
+
+if __name__ == "__main__":
+    Game().run() # Initialize and run the game
\ No newline at end of file
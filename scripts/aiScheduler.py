@@ -0,0 +1,89 @@
+"""
+This file contains the AI scheduler, which decides which enemies think (choose a direction) each simulation step.
+
+Enemies near the player (inside the view around them) think every step. Enemies further away are in a cheap
+tier, and only think every far_interval steps (spread out by their index), moving in the direction they last
+chose in between. Thinking has a time budget for each step: when thinking takes longer than the budget, the
+number of enemies that can think in a step is lowered to what would have fit (and raised again while there is
+time left over). Enemies that are due but don't fit keep their last direction, and take turns round-robin.
+How often the budget is exceeded is counted, so it can be shown in the profiler overlay.
+
+The budget and the far interval are set with "ai-budget" (milliseconds, 0 for none) and "ai-far-interval"
+in the performance section of settings.json. Thinking is timed with time.perf_counter, unless another clock is
+given (the benchmark uses a simulated clock, so its runs are the same every time).
+
+--+ Classes +--
+AIScheduler(budget, far_interval, view_size, clock) - Chooses the enemies that think each step, within a time budget.
+"""
+# --------------------------------------------------------------------------------
+# External imports
+import time
+
+VIEW_MARGIN = 32 # Pixels around the view that still count as near
+
+class AIScheduler():
+    """Chooses the enemies that think each step, within a time budget."""
+    def __init__(self, budget=0.002, far_interval=8, view_size=None, clock=time.perf_counter):
+        """Initialize variables for AIScheduler, budget is in seconds (0 for no budget), view_size is the size of the
+        view around the player that is near (None for everything), clock returns the time thinks are timed with (in seconds)"""
+        self.budget = budget
+        self.clock = clock
+        self.far_interval = max(1, far_interval)
+        self.view_size = view_size
+        self.cursor = 0 # Index that gets the first turn when not every enemy can think
+        self.limit = None # Most enemies that can think in a step (None for no limit), set from the measured time
+        self.start = 0
+        self.steps = 0 # Steps scheduled
+        self.over_budget = 0 # Steps where thinks were put off, or thinking took longer than the budget
+        self.counted = False # The current step was already counted in over_budget
+        self.deferred = 0 # Thinks put off to a later step
+        self.thinks = 0 # Thinks run
+
+    def is_near(self, x, y, target):
+        """Returns True if the position (x, y) is near target (the player's center), works on NumPy arrays too"""
+        if self.view_size == None:
+            return True
+        half_width = self.view_size[0] / 2 + VIEW_MARGIN
+        half_height = self.view_size[1] / 2 + VIEW_MARGIN
+        return (abs(x - target[0]) <= half_width) & (abs(y - target[1]) <= half_height)
+
+    def select(self, near):
+        """Returns the indexes of the enemies that think this step, near is True for each enemy near the player"""
+        due = [i for i, is_near in enumerate(near) if is_near or (i + self.steps) % self.far_interval == 0]
+        self.steps += 1
+        self.counted = False
+        if self.budget <= 0 or self.limit == None or len(due) <= self.limit:
+            return due
+
+        # Not every enemy fits in the budget, take turns starting from the cursor
+        start = next((n for n, i in enumerate(due) if i >= self.cursor), 0)
+        chosen = (due[start:] + due[:start])[:self.limit]
+        self.cursor = chosen[-1] + 1
+        self.deferred += len(due) - self.limit
+        self.over_budget += 1
+        self.counted = True
+        return sorted(chosen)
+
+    def begin(self):
+        """Start timing the thinks of a step"""
+        self.start = self.clock()
+
+    def end(self, count):
+        """Finish timing the thinks of a step, count is the number of enemies that thought"""
+        self.thinks += count
+        if count <= 0 or self.budget <= 0:
+            return
+        elapsed = self.clock() - self.start
+        if elapsed > self.budget:
+            # Lower the limit to the number of enemies that would have fit
+            self.limit = max(1, int(count * self.budget / elapsed))
+            if not self.counted:
+                self.over_budget += 1
+                self.counted = True
+        elif self.limit != None and count >= self.limit:
+            # There was time left over, let more enemies think (at most twice as many)
+            self.limit = max(self.limit + 1, int(count * min(2, self.budget / elapsed)))
+
+    def stats(self):
+        """Returns the counts of the scheduler, for the profiler overlay and benchmarks"""
+        return {'ai steps': self.steps, 'ai over budget': self.over_budget, 'ai deferred thinks': self.deferred}
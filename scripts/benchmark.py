@@ -0,0 +1,159 @@
+"""
+This program runs the game headless (no window or sound) for a fixed number of ticks in each room of a save,
+with scripted player input, and reports how long each subsystem took.
+
+Each tick runs one Game.update() and one Game.render(), the same simulation step and frame the game loop runs,
+and the subsystems are timed by the game's profiler. Input is generated from a seed and every tick moves the
+animations forward by the same step. The AI time budget is checked against a simulated clock, where every
+enemy think takes think_cost seconds, so two runs with the same arguments simulate exactly the same game,
+and only the timings change.
+
+Run from the project directory with:  python -m scripts.benchmark [--ticks 600] [--rooms 0 1 2] [--json out.json]
+
+--+ Classes +--
+Benchmark(save_file, ticks, seed, think_cost) - Runs a headless game and times its tile, player and enemy updates,
+                                                rendering to the off-screen display, and scaling.
+"""
+# --------------------------------------------------------------------------------
+# External imports
+import argparse, json, random
+
+# Internal imports
+from main import Game
+from scripts.utils import animation_clock
+
+# Timed subsystems, in the order they run each tick, with the profiler phases that make them up
+PHASES = {
+    'tiles': ('tiles',),
+    'player': ('player',),
+    'enemies': ('enemies',),
+    'render': ('clear', 'tilemap render', 'entity render', 'hud render', 'draw'),
+    'scaling': ('scaling',)
+}
+SUBSYSTEMS = tuple(PHASES)
+DIRECTIONS = ('up', 'down', 'left', 'right')
+INPUT_INTERVAL = 30 # Ticks between changes of the scripted input
+THINK_COST = 0.00002 # Seconds each enemy think takes on the simulated clock of the AI budget
+
+class Benchmark():
+    """Runs a headless game and times each subsystem"""
+    def __init__(self, save_file='data/saves/trial_chambers', ticks=600, seed=0, think_cost=THINK_COST):
+        """Initialize variables for Benchmark, and create the headless game"""
+        self.ticks = ticks
+        self.seed = seed
+        self.think_cost = think_cost
+        self.game = Game(headless=True, save_file=save_file)
+        self.game.player.health_bar.damage_multiplier = 0 # The player can not die, so every room is run for every tick
+        self.step = 1 / self.game.settings.simulation_rate
+        # Time the subsystems with the game's profiler (without its overlay or trace)
+        self.game.profiler.active = True
+        self.game.profiler.show_overlay = False
+        self.game.profiler.trace_file = None
+        # The AI budget is kept, but thinks are timed on a simulated clock so the same enemies think every run
+        scheduler = self.game.tilemap.aiScheduler
+        scheduler.clock = lambda: scheduler.thinks * self.think_cost
+
+    def run_room(self, room):
+        """Run the ticks in room, returns the list of times (in seconds) for each subsystem"""
+        game = self.game
+        player = game.player
+        self.enter_room(room)
+
+        # Input depends only on the seed and the room, so every run presses the same keys
+        rng = random.Random(f"{self.seed};{room}")
+        times = {name: [] for name in SUBSYSTEMS}
+        for tick in range(self.ticks):
+            if tick % INPUT_INTERVAL == 0:
+                game.movement = {direction: rng.random() < 0.35 for direction in DIRECTIONS}
+            if game.gameManager.current_room != room:
+                # The player walked through a door, put them back so the whole run is timed in this room
+                self.enter_room(room)
+
+            game.profiler.begin_frame()
+            game.update()
+            game.render(1)
+            for name, phases in PHASES.items():
+                times[name].append(sum(game.profiler.frame.get(phase, 0) for phase in phases))
+            game.profiler.end_frame()
+            animation_clock.update(self.step)
+        return times
+
+    def enter_room(self, room):
+        """Set the room, with the player in the middle of it and the camera on them"""
+        game = self.game
+        game.gameManager.set_room(room)
+        game.player.pos = [(game.tilemap.size[0]//2)*game.tilemap.tile_size, game.tilemap.size[1]//2*game.tilemap.tile_size]
+        game.player.projectiles.clear()
+        game.player.store_pos()
+        game.scroll = [game.player.rect().centerx - game.display.get_width() / 2, game.player.rect().centery - game.display.get_height() / 2]
+        game.prev_scroll = game.scroll.copy()
+
+    def run(self, rooms=None):
+        """Run every room in rooms (every room in the save if None), returns a report dictionary"""
+        if rooms == None:
+            rooms = sorted(self.game.gameManager.rooms)
+        report = {'ticks': self.ticks, 'seed': self.seed, 'rooms': {}}
+        totals = {name: [] for name in SUBSYSTEMS}
+        for room in rooms:
+            times = self.run_room(room)
+            report['rooms'][room] = summarize(times)
+            for name in SUBSYSTEMS:
+                totals[name].extend(times[name])
+        report['total'] = summarize(totals)
+        report['ai'] = self.game.tilemap.aiScheduler.stats()
+        return report
+
+    def state(self):
+        """Returns the simulated state of the game (room, player and enemies), runs with the same arguments end in the same state"""
+        game = self.game
+        return {
+            'room': game.gameManager.current_room,
+            'player': ([float(v) for v in game.player.pos], game.player.health_bar.health),
+            'enemies': [([float(v) for v in enemy.pos], float(enemy.health)) for enemy in game.tilemap.enemyManager.enemies],
+            'meta': game.gameManager.rooms[game.gameManager.current_room].get('meta', {})
+        }
+
+def percentile(values, fraction):
+    """Returns the value at fraction (0 - 1) of the sorted values"""
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+def summarize(times):
+    """Returns the timing summary (in milliseconds) of each subsystem, and the ticks per second of all of them"""
+    summary = {}
+    for name, values in times.items():
+        summary[name] = {
+            'mean': sum(values) / len(values) * 1000,
+            'p50': percentile(values, 0.5) * 1000,
+            'p95': percentile(values, 0.95) * 1000,
+            'max': max(values) * 1000
+        }
+    tick_times = [sum(tick) for tick in zip(*times.values())]
+    summary['fps'] = len(tick_times) / sum(tick_times)
+    return summary
+
+def print_report(report):
+    """Print a report as a table"""
+    print(f"{report['ticks']} ticks per room, seed {report['seed']}  (times in ms, mean / p95)")
+    print("room    " + "".join(f"{name:>18}" for name in SUBSYSTEMS) + f"{'fps':>10}")
+    for room, summary in list(report['rooms'].items()) + [('total', report['total'])]:
+        row = "".join(f"{summary[name]['mean']:>10.3f} /{summary[name]['p95']:>6.3f}" for name in SUBSYSTEMS)
+        print(f"{room:<8}{row}{summary['fps']:>10.1f}")
+    if 'ai' in report:
+        print("  ".join(f"{k}: {v}" for k, v in report['ai'].items()))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the game headless and time each subsystem.")
+    parser.add_argument('--save', default='data/saves/trial_chambers', help="save directory to load")
+    parser.add_argument('--ticks', type=int, default=600, help="ticks to run in each room")
+    parser.add_argument('--rooms', type=int, nargs='*', help="rooms to run (every room by default)")
+    parser.add_argument('--seed', type=int, default=0, help="seed for the scripted input")
+    parser.add_argument('--think-cost', type=float, default=THINK_COST * 1000000, help="microseconds each enemy think takes on the AI budget's clock")
+    parser.add_argument('--json', help="also write the report to this file")
+    args = parser.parse_args()
+
+    report = Benchmark(args.save, args.ticks, args.seed, args.think_cost / 1000000).run(args.rooms)
+    print_report(report)
+    if args.json != None:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=4)
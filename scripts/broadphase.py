@@ -0,0 +1,61 @@
+"""
+This file contains the broadphase, a uniform grid of the moving entities in a room.
+
+Each entity's Rect is added to every grid cell it overlaps, so a query only tests the entities in the cells
+the queried Rect overlaps, and overlapping pairs are only looked for between entities that share a cell.
+Building the grid and answering a query costs about the number of entities plus the number of results,
+instead of testing every entity against every other one.
+
+--+ Classes +--
+Broadphase(cell_size) - Uniform grid of Rects, answers overlap queries and finds overlapping pairs.
+"""
+# --------------------------------------------------------------------------------
+class Broadphase():
+    """Uniform grid of Rects, answers overlap queries and finds overlapping pairs."""
+    def __init__(self, cell_size=64):
+        """Initialize variables for Broadphase, cell_size is the width and height of a cell in pixels"""
+        self.cell_size = cell_size
+        self.cells = {} # Keys of the Rects that overlap each cell, keyed by cell
+        self.rects = [] # Rect of each key (keys are the order the Rects were added in)
+
+    def clear(self):
+        """Remove every Rect"""
+        self.cells = {}
+        self.rects = []
+
+    def get_cells(self, rect):
+        """Returns the cells that the Rect overlaps"""
+        size = self.cell_size
+        return [
+            (x, y)
+            for x in range(rect.left // size, (rect.right - 1) // size + 1)
+            for y in range(rect.top // size, (rect.bottom - 1) // size + 1)
+        ]
+
+    def add(self, rect):
+        """Add a Rect to the grid, returns its key"""
+        key = len(self.rects)
+        self.rects.append(rect)
+        for cell in self.get_cells(rect):
+            self.cells.setdefault(cell, []).append(key)
+        return key
+
+    def query(self, rect):
+        """Returns the keys of the Rects that collide with rect, in the order they were added"""
+        keys = set()
+        for cell in self.get_cells(rect):
+            for key in self.cells.get(cell, ()):
+                if key not in keys and self.rects[key].colliderect(rect):
+                    keys.add(key)
+        return sorted(keys)
+
+    def pairs(self):
+        """Returns a list of (key, key) for every two Rects that collide, each pair only once"""
+        pairs = set()
+        for keys in self.cells.values():
+            for i in range(len(keys) - 1):
+                rect = self.rects[keys[i]]
+                for other in keys[i + 1:]:
+                    if (keys[i], other) not in pairs and rect.colliderect(self.rects[other]):
+                        pairs.add((keys[i], other))
+        return sorted(pairs)
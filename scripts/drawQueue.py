@@ -0,0 +1,57 @@
+"""
+This file contains the draw queue, which collects everything drawn to the screen during a frame.
+
+Commands are sorted by layer when the queue is flushed (commands on the same layer keep the order
+they were added in), and the blits for each surface are done with one Surface.blits() call.
+
+--+ Classes +--
+DrawQueue() - Collects draw commands for target surfaces, and draws them in layer order on flush()
+
+--+ Variables +--
+LAYER_* - Layers used for drawing, lower layers are drawn first.
+"""
+# --------------------------------------------------------------------------------
+# Layers, lower layers are drawn first
+LAYER_TILES = 0
+LAYER_DECOR = 1
+LAYER_ITEMS = 2
+LAYER_ENTITIES = 3
+LAYER_PROJECTILES = 4
+LAYER_TINT = 5
+LAYER_HUD = 6
+
+class DrawQueue():
+    """Collects draw commands for target surfaces, and draws them in layer order on flush()"""
+    def __init__(self):
+        """Initialize variables for DrawQueue"""
+        self.targets = {} # List of (layer, image, pos) commands for each target surface, keyed by surface
+
+    def set_targets(self, *surfaces):
+        """Set the surfaces that are drawn through the queue, drawing to any other surface is done immediately"""
+        self.targets = {surface: [] for surface in surfaces}
+
+    def add(self, surface, image, pos, layer):
+        """Queue a blit of image to surface"""
+        self.targets[surface].append((layer, image, pos))
+
+    def add_call(self, surface, function, layer):
+        """Queue a function that draws to surface (called with the surface), for drawing that is not a blit"""
+        self.targets[surface].append((layer, None, function))
+
+    def flush(self):
+        """Draw every queued command in layer order, and empty the queue"""
+        for surface, commands in self.targets.items():
+            commands.sort(key=lambda command: command[0]) # Sorting is stable, so each layer keeps its order
+            batch = []
+            for layer, image, pos in commands:
+                if image == None:
+                    # Draw the blits before the call, so the order is kept
+                    if batch:
+                        surface.blits(batch, False)
+                        batch = []
+                    pos(surface)
+                else:
+                    batch.append((image, pos))
+            if batch:
+                surface.blits(batch, False)
+            commands.clear()
@@ -3,42 +3,351 @@
 # Version: 1.0
 # --------------------------------------------------------------------------------
 """
-Enemy manager class, holds list of enemies and target player to determine movement. 
+Enemy manager class, holds list of enemies and target player to determine movement.
 
+When NumPy is installed, the enemy attributes that change every frame are stored in arrays
+(structure-of-arrays), and all enemies are updated at once. The Enemy objects read and write
+these arrays, so they can still be used the same way.
+
+Enemy Rects are kept in a broadphase grid, which answers projectile hits and player contacts, and finds
+the enemies that overlap so they can be pushed apart. It is built again when it is next used after the
+enemies moved, so it is built about once per simulation step.
+
+When enemies die, ENEMY_KILLED is published on the game manager's event bus.
 """
 # --------------------------------------------------------------------------------
 # External imports
 import pygame
+try:
+    import numpy
+except ImportError: # NumPy is optional, without it enemies are updated one at a time
+    numpy = None
+
+# Internal imports
+from scripts.broadphase import Broadphase
+from scripts.aiScheduler import AIScheduler
+from scripts.flowField import NOT_FOUND
+from scripts.eventBus import ENEMY_KILLED
+
+# Enemy attributes stored in the manager arrays, with the number of columns (0 for single values)
+ARRAY_FIELDS = {
+    'pos': 2,
+    'velocity': 2,
+    'size': 2,
+    'hitbox': 2,
+    'health': 0,
+    'damaged': 0,
+    'tick': 0,
+    'immunity_frames': 0,
+    'damage': 0,
+    'multiplier': 0,
+    'distance_from_target': 0,
+    'heading': 2
+}
+# Entity states, indexed by (sign(x movement) + 1) * 3 + (sign(y movement) + 1)
+STATES = ('down-left', 'left', 'up-left', 'up', 'idle', 'down', 'down-right', 'right', 'up-right')
+SEPARATION_SPEED = 1 # Most an enemy is pushed away from an overlapping enemy in one simulation step (in pixels)
 
 class EnemyManager():
     """Enemy manager class, holds list of enemies and target player to determine movement. """
-    def __init__(self):
+    def __init__(self, tilemap=None, vectorized=True):
         """Initialize variables for EnemyManager"""
         self.enemies = []
-        
+        self.tilemap = tilemap
+        self.vectorized = vectorized and numpy != None
+        self.arrays = {}
+        if self.vectorized:
+            self.allocate(16)
+        self.broadphase = Broadphase(tilemap.tile_size * 2 if tilemap != None else 64)
+        self.scheduler = tilemap.aiScheduler if tilemap != None else AIScheduler(budget=0) # Chooses the enemies that think each step
+        self.stale = True # The enemies moved since the broadphase was built
+
+    def allocate(self, capacity):
+        """Create the arrays with room for capacity enemies, keeping the current enemies"""
+        arrays = {}
+        for name, columns in ARRAY_FIELDS.items():
+            shape = (capacity, columns) if columns else (capacity,)
+            arrays[name] = numpy.zeros(shape, dtype=bool if name == 'damaged' else numpy.float64)
+            if name in self.arrays:
+                arrays[name][:len(self.enemies)] = self.arrays[name][:len(self.enemies)]
+        self.arrays = arrays
+
+    def get(self, name, index):
+        """Returns an enemy attribute from the arrays (vectors are returned as views of the array)"""
+        if ARRAY_FIELDS[name]:
+            return self.arrays[name][index]
+        return self.arrays[name][index].item()
+
+    def set(self, name, index, value):
+        """Sets an enemy attribute in the arrays"""
+        self.arrays[name][index] = value
+
     def update(self, physicsEntity):
         """Update the enemies with player location to determine what movement the enemy will make."""
-        for enemy in self.enemies:
-            if enemy.health < 0:
+        if self.tilemap != None and self.enemies:
+            self.tilemap.flowField.update(physicsEntity.rect().center) # Only built again when the player changed tile
+        if self.vectorized:
+            self.update_arrays(physicsEntity)
+        else:
+            dead = [enemy for enemy in self.enemies if enemy.health < 0]
+            for enemy in dead:
                 enemy.on_death(enemy, self)
                 self.enemies.remove(enemy)
+                self.stale = True
+            self.publish_killed(dead)
+            # Check for contact with the passed entity, before the enemies move
+            for enemy in self.check_collisions(physicsEntity.rect()):
+                physicsEntity.health_bar.damage(enemy.damage)
+            # Only the enemies chosen by the scheduler think, every enemy moves
+            target = physicsEntity.rect().center
+            thinkers = self.scheduler.select([self.scheduler.is_near(enemy.pos[0] + enemy.size[0] / 2, enemy.pos[1] + enemy.size[1] / 2, target)
+                                              for enemy in self.enemies])
+            self.scheduler.begin()
+            for i in thinkers:
+                self.enemies[i].think(physicsEntity)
+            self.scheduler.end(len(thinkers))
+            for enemy in self.enemies:
+                enemy.act()
+        self.stale = True
+        self.separate()
+
+    def update_arrays(self, physicsEntity):
+        """Update every enemy at once using the arrays, this matches Enemy.think() and Enemy.act()"""
+        # Remove dead enemies
+        dead = [self.enemies[i] for i in numpy.flatnonzero(self.arrays['health'][:len(self.enemies)] < 0).tolist()]
+        for enemy in dead:
+            enemy.on_death(enemy, self)
+        if dead:
+            self.remove(*dead)
+        self.publish_killed(dead)
+
+        n = len(self.enemies)
+        if n == 0:
+            return
+        pos = self.arrays['pos'][:n]
+        velocity = self.arrays['velocity'][:n]
+        size = self.arrays['size'][:n]
+        hitbox = self.arrays['hitbox'][:n]
+        damaged = self.arrays['damaged'][:n]
+        tick = self.arrays['tick'][:n]
+        distance = self.arrays['distance_from_target'][:n]
+
+        # Increment ticks for immunity frames
+        expired = damaged & (tick >= self.arrays['immunity_frames'][:n])
+        tick[damaged & ~expired] += 1
+        tick[expired] = 0
+        damaged[expired] = False
+
+        # Only the enemies chosen by the scheduler think (choose their heading), every enemy moves
+        heading = self.arrays['heading'][:n]
+        center_x = pos[:, 0] + size[:, 0] / 2
+        center_y = pos[:, 1] + size[:, 1] / 2
+        near = numpy.broadcast_to(self.scheduler.is_near(center_x, center_y, physicsEntity.rect().center), (n,))
+        thinkers = numpy.array(self.scheduler.select(near.tolist()), dtype=int)
+        self.scheduler.begin()
+        if len(thinkers):
+            # Determine what direction each enemy needs to move in to go toward the target
+            t = len(thinkers)
+            think_pos = pos[thinkers]
+            think_size = size[thinkers]
+            think_distance = distance[thinkers]
+            target_x = numpy.full(t, float(physicsEntity.pos[0]))
+            target_y = numpy.full(t, float(physicsEntity.pos[1]))
+            reach = numpy.full(t, 10.0) # Distance from the target that is close enough
+            steps = self.flow_steps(center_x[thinkers], center_y[thinkers])
+            follow = steps >= 0
+            if follow.any():
+                # Away from the player, follow the flow field around walls (to the center of the next tile)
+                width = self.tilemap.flowField.width
+                tile_size = self.tilemap.tile_size
+                target_x[follow] = (steps[follow] % width + 0.5) * tile_size - think_size[follow, 0] / 2
+                target_y[follow] = (steps[follow] // width + 0.5) * tile_size - think_size[follow, 1] / 2
+                think_distance = numpy.where(follow, 0, think_distance)
+                reach[follow] = 1
+            dx = think_pos[:, 0] - target_x
+            dy = think_pos[:, 1] - target_y
+            left = dx - think_distance > reach
+            right = ~left & (dx + think_distance < -reach)
+            down = dy - think_distance < -reach
+            up = ~down & (dy + think_distance > reach)
+            heading[thinkers, 0] = right.astype(numpy.float64) - left
+            heading[thinkers, 1] = down.astype(numpy.float64) - up
+        self.scheduler.end(len(thinkers))
+        left = heading[:, 0] < 0
+        right = heading[:, 0] > 0
+        up = heading[:, 1] < 0
+        down = heading[:, 1] > 0
+
+        # Check for collision with passed entity
+        for enemy in self.check_collisions(physicsEntity.rect()):
+            physicsEntity.health_bar.damage(enemy.damage)
+
+        # Calculate movement for the frame
+        multiplier = self.arrays['multiplier'][:n]
+        frame_x = (right.astype(numpy.float64) - left + velocity[:, 0]) * multiplier
+        frame_y = (down.astype(numpy.float64) - up + velocity[:, 1]) * multiplier
+
+        # Enemies that end up next to a solid tile need collisions, they are moved one at a time
+        near_solid = self.near_solid(pos[:, 0] + frame_x, pos[:, 1]) | self.near_solid(pos[:, 0] + frame_x, pos[:, 1] + frame_y)
+        for i in numpy.flatnonzero(near_solid).tolist():
+            self.enemies[i].move(up=bool(up[i]), down=bool(down[i]), left=bool(left[i]), right=bool(right[i]))
+
+        # Move the rest of the enemies
+        free = ~near_solid
+        pos[free, 0] += frame_x[free]
+        pos[free, 1] += frame_y[free]
+        states = ((numpy.sign(frame_x) + 1) * 3 + numpy.sign(frame_y) + 1).astype(int).tolist()
+        for i in numpy.flatnonzero(free).tolist():
+            enemy = self.enemies[i]
+            enemy.state = STATES[states[i]]
+            enemy.flipx = bool(frame_x[i] < 0)
+            enemy.flipy = bool(frame_y[i] < 0)
+
+    def get_broadphase(self):
+        """Returns the broadphase, built again if the enemies moved since it was last built"""
+        if self.stale:
+            self.broadphase.clear()
+            if self.vectorized:
+                # Enemy.rect() for every enemy at once (Rect values are truncated, like pygame.Rect)
+                n = len(self.enemies)
+                pos, size, hitbox = self.arrays['pos'][:n], self.arrays['size'][:n], self.arrays['hitbox'][:n]
+                x = numpy.trunc(pos[:, 0] + (size[:, 0] - hitbox[:, 0]) // 2).astype(int).tolist()
+                y = numpy.trunc(pos[:, 1] + (size[:, 1] - hitbox[:, 1]) // 2).astype(int).tolist()
+                for rect in zip(x, y, hitbox[:, 0].astype(int).tolist(), hitbox[:, 1].astype(int).tolist()):
+                    self.broadphase.add(pygame.Rect(rect))
+            else:
+                for enemy in self.enemies:
+                    self.broadphase.add(enemy.rect())
+            self.stale = False
+        return self.broadphase
+
+    def separate(self):
+        """Push overlapping enemies apart, along the axis they overlap the least on"""
+        broadphase = self.get_broadphase()
+        pairs = broadphase.pairs()
+        if not pairs:
+            return
+        # Add up the pushes of every pair first, so each enemy is only moved once
+        pushes = {}
+        for a, b in pairs:
+            rect_a, rect_b = broadphase.rects[a], broadphase.rects[b]
+            overlap_x = min(rect_a.right, rect_b.right) - max(rect_a.left, rect_b.left)
+            overlap_y = min(rect_a.bottom, rect_b.bottom) - max(rect_a.top, rect_b.top)
+            # Enemies on the same spot are pushed apart in the order they were added
+            push_a = pushes.setdefault(a, [0, 0])
+            push_b = pushes.setdefault(b, [0, 0])
+            if overlap_x <= overlap_y:
+                push = (-1 if rect_a.centerx <= rect_b.centerx else 1) * overlap_x / 2
+                push_a[0] += push
+                push_b[0] -= push
             else:
-                enemy.update(physicsEntity)
-                
-    def render(self, disp, offset):
-        """Render enemies to screen"""
+                push = (-1 if rect_a.centery <= rect_b.centery else 1) * overlap_y / 2
+                push_a[1] += push
+                push_b[1] -= push
+        for key, (x, y) in sorted(pushes.items()):
+            self.push(self.enemies[key], max(-SEPARATION_SPEED, min(x, SEPARATION_SPEED)), max(-SEPARATION_SPEED, min(y, SEPARATION_SPEED)))
+        self.stale = True
+
+    def push(self, enemy, x, y):
+        """Move the enemy by (x, y) pixels, unless that would move it into a solid tile or out of the room"""
+        enemy.pos[0] += x
+        enemy.pos[1] += y
+        if self.tilemap != None:
+            rect = enemy.rect()
+            tile_size = self.tilemap.tile_size
+            blocked = rect.collidelist(self.tilemap.get_solid_rects_around(enemy.pos)) != -1
+            for corner in (rect.topleft, (rect.right - 1, rect.top), (rect.left, rect.bottom - 1), (rect.right - 1, rect.bottom - 1)):
+                if self.tilemap.get_tile((corner[0] // tile_size, corner[1] // tile_size)) == None:
+                    blocked = True
+            if blocked:
+                enemy.pos[0] -= x
+                enemy.pos[1] -= y
+
+    def flow_steps(self, x, y):
+        """Returns the index of the next flow field tile for each position (in pixels), -1 to chase the target directly"""
+        steps = numpy.full(len(x), -1)
+        if self.tilemap == None:
+            return steps
+        field = self.tilemap.flowField
+        cell_x = numpy.floor_divide(x, self.tilemap.tile_size).astype(int)
+        cell_y = numpy.floor_divide(y, self.tilemap.tile_size).astype(int)
+        inside = (cell_x >= 0) & (cell_x < field.width) & (cell_y >= 0) & (cell_y < field.height)
+        if inside.any():
+            indexes = cell_y[inside] * field.width + cell_x[inside]
+            next_cell = numpy.frombuffer(field.next_cell, dtype=numpy.intc)
+            # Work out the next steps of the tiles that weren't asked about yet, the rest are read at once
+            for index in numpy.unique(indexes[next_cell[indexes] == NOT_FOUND]).tolist():
+                field.next_step(index)
+            steps[inside] = next_cell[indexes]
+        return steps
+
+    def near_solid(self, x, y):
+        """Returns a bool array, True where the position is within one tile of a solid tile (or outside of the grid)"""
+        if self.tilemap == None:
+            return numpy.ones(len(x), dtype=bool)
+        width = self.tilemap.size[0] + 1
+        height = self.tilemap.size[1] + 1
+        near = self.tilemap.near_solid_grid
+        if near is None:
+            # Spread each solid tile to the tiles around it, padded so positions just outside the room work
+            # (kept on the tilemap until its solidity changes)
+            solid = numpy.pad(numpy.frombuffer(bytes(self.tilemap.solid_grid), dtype=numpy.uint8).reshape(height, width), 2)
+            near = numpy.zeros_like(solid)
+            for ox in (-1, 0, 1):
+                for oy in (-1, 0, 1):
+                    near[1:-1, 1:-1] |= solid[1 + oy:height + 3 + oy, 1 + ox:width + 3 + ox]
+            self.tilemap.near_solid_grid = near
+
+        cell_x = numpy.floor_divide(x, self.tilemap.tile_size).astype(int) + 2
+        cell_y = numpy.floor_divide(y, self.tilemap.tile_size).astype(int) + 2
+        inside = (cell_x >= 0) & (cell_x < width + 4) & (cell_y >= 0) & (cell_y < height + 4)
+        # Positions outside of the grid can have tiles the grid doesn't hold (at negative positions), check them one at a time
+        return ~inside | (near[cell_y.clip(0, height + 3), cell_x.clip(0, width + 3)] == 1)
+
+    def store_positions(self):
+        """Store enemy positions before a simulation step, so rendering can interpolate between steps"""
+        for enemy in self.enemies:
+            enemy.store_pos()
+
+    def render(self, disp, offset, alpha=1):
+        """Render enemies to screen, alpha of the way from the previous simulation step to the current one"""
         for enemy in self.enemies:
-            enemy.render(disp, offset)
-            
+            enemy.render(disp, offset, alpha)
+
     def add(self, enemy):
         """Add enemy to manager"""
+        self.stale = True
+        if self.vectorized:
+            if len(self.enemies) >= len(self.arrays['pos']):
+                self.allocate(len(self.arrays['pos']) * 2)
+            for name in ARRAY_FIELDS:
+                self.arrays[name][len(self.enemies)] = getattr(enemy, name)
+            enemy.index = len(self.enemies)
+            enemy.manager = self
         self.enemies.append(enemy)
 
-    def check_collisions(self, rect):
-        """Check if rect collided with any entities"""
-        entities = []
-        for entity in self.enemies:
-            if entity.rect().colliderect(rect):
-                entities.append(entity)
+    def remove(self, *enemies):
+        """Remove enemies from manager"""
+        self.stale = True
+        for enemy in enemies:
+            if self.vectorized:
+                # Move the values back onto the enemy, then close the gap in the arrays
+                values = {name: self.get(name, enemy.index) for name in ARRAY_FIELDS}
+                enemy.manager = None
+                for name, value in values.items():
+                    setattr(enemy, name, value.tolist() if ARRAY_FIELDS[name] else value)
+                for name in ARRAY_FIELDS:
+                    self.arrays[name][enemy.index:len(self.enemies) - 1] = self.arrays[name][enemy.index + 1:len(self.enemies)].copy()
+                for other in self.enemies[enemy.index + 1:]:
+                    other.index -= 1
+            self.enemies.remove(enemy)
+
+    def publish_killed(self, dead):
+        """Publish ENEMY_KILLED for each dead enemy, after they were removed"""
+        if dead and self.tilemap != None and self.tilemap.gameManager != None:
+            for enemy in dead:
+                self.tilemap.gameManager.events.publish(ENEMY_KILLED, enemy, len(self.enemies))
 
-        return entities
\ No newline at end of file
+    def check_collisions(self, rect):
+        """Check if rect collided with any entities, returns them in the order they were added"""
+        return [self.enemies[key] for key in self.get_broadphase().query(rect)]
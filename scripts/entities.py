@@ -14,17 +14,22 @@ Enemey()
 # --------------------------------------------------------------------------------
 # External imports
 import pygame
-from scripts.utils import render_font
 
 # Internal imports
-from scripts.guiElements import ItemBar, Inventory, HealthBar, GameOver, ClosableTextBox
+from scripts.guiElements import ItemBar, Inventory, HealthBar, GameOver, ClosableTextBox, Label
 from scripts.guiManager import GUIManager
 from scripts.utils import blit
+from scripts.drawQueue import LAYER_ENTITIES, LAYER_PROJECTILES
 from scripts.itemAttributes import Accessory
+from scripts.projectileManager import ProjectileManager
+from scripts.eventBus import ROOM_COMPLETED
 import math
+
+MAX_INTERPOLATION = 32 # Movement in one simulation step above this (in pixels) is drawn without interpolation
 # --------------------------------------------------------------------------------
 class PhysicsEntity:
     """Class object used for creating objects that interact with physics"""
+    prev_pos = None # Position before the last simulation step, set by store_pos()
 
     def __init__ (self, tilemap, pos, size, hitbox, sprite=None, multiplier=1, hitbox_on_bottom=True, *exceptions):
         """Initialize the physics entity"""
@@ -152,7 +157,18 @@ class PhysicsEntity:
         else:
             self.state = 'idle'
         
-    def render(self, disp, offset=(0, 0)):
+    def store_pos(self):
+        """Store the position before a simulation step, so rendering can interpolate between steps"""
+        self.prev_pos = (self.pos[0], self.pos[1])
+
+    def render_pos(self, alpha=1):
+        """Returns the position to render at, alpha of the way from the previous simulation step to the current one"""
+        if self.prev_pos == None or abs(self.pos[0] - self.prev_pos[0]) + abs(self.pos[1] - self.prev_pos[1]) > MAX_INTERPOLATION:
+            return self.pos # Not moved by a step yet, or moved too far to be movement (changed rooms)
+        return (self.prev_pos[0] + (self.pos[0] - self.prev_pos[0]) * alpha,
+                self.prev_pos[1] + (self.pos[1] - self.prev_pos[1]) * alpha)
+
+    def render(self, disp, offset=(0, 0), alpha=1):
         """Render the entity to the screen"""
         img = None # Set to None as placeholder
         if type(self.sprite) == dict:
@@ -160,7 +176,8 @@ class PhysicsEntity:
         else:
             img = self.sprite
         
-        blit(disp, img, (self.pos[0] - offset[0], self.pos[1] - offset[1]))
+        pos = self.render_pos(alpha)
+        blit(disp, img, (pos[0] - offset[0], pos[1] - offset[1]), LAYER_ENTITIES)
 
     def set_pos(self, position):
         """Sets the location of the entity, relative to the center of the rect"""
@@ -178,6 +195,8 @@ class Player(PhysicsEntity):
         self.inventory = {}
         # Create HUD items
         self.hud = GUIManager()
+        self.hud.add('room-label', Label((5, self.game.display.get_height()-5), self.game.scale, self.gameManager.room_font))
+        self.room_label = self.hud.menu_items['room-label']
         self.game_over = False
         self.damage_multiplier = 1
         self.hud.add('itembar', ItemBar(self.game.dPos.BOTTOM_CENTER, (81, 24), self.game.scale, self.assetMap.gui['itembar'], self.assetMap.gui['itembar_selected']))
@@ -199,14 +218,17 @@ class Player(PhysicsEntity):
 
         if self.gameManager.get_meta("text") != {}:
             self.hud.add("text-box", ClosableTextBox((self.game.dPos.TOP_CENTER[0], 42), self.game.scale, self.assetMap.gui['text-box'], self.assetMap.gui['close'], self.gameManager.get_meta("text")))
+
+        self.gameManager.events.subscribe(ROOM_COMPLETED, self.on_room_completed)
+        self.gameManager.check_completed() # The first room may have no enemies
  
-        self.projectiles = []
+        self.projectiles = ProjectileManager()
 
         super().__init__(game.tilemap, pos, size, hitbox, self.assetMap.entities['player'], multiplier, True, exceptions)
         
     def reset(self):
         """Function that handles what is done when game over."""
-        self.gameManager.set_room(0)
+        self.gameManager.set_room(0, reload=True) # Start the room again, instead of restoring it from the room cache
         self.health_bar.health = self.health_bar.max_health
         self.health_bar.dead = False
         self.hud.background_tint = False
@@ -217,6 +239,13 @@ class Player(PhysicsEntity):
         self.arrows = []
         self.pos = [(self.tilemap.size[0]//2)*self.tilemap.tile_size, self.tilemap.size[1]//2*self.tilemap.tile_size]
 
+    def on_room_completed(self, room):
+        """Show the completed message of the room, if it has one (Called when the room is completed)"""
+        if self.gameManager.get_meta('completed-text') != {}:
+            self.hud.add('text-box', 
+            ClosableTextBox((self.game.dPos.TOP_CENTER[0], 42), self.game.scale, self.assetMap.gui['text-box'], self.assetMap.gui['close'], self.gameManager.get_meta("completed-text"))
+                         )
+
     def check_events(self, event):
         """Check events for the player."""
         if not (self.health_bar.dead or self.game_over):
@@ -251,6 +280,7 @@ class Player(PhysicsEntity):
     def update(self, **movement):
         """Updates the player."""
         super().update(**movement)
+        self.health_bar.update()
         # Update currently held items attributes 
         if self.itembar.items[self.itembar.slot_selected][0] != None:
             flag = True
@@ -262,16 +292,6 @@ class Player(PhysicsEntity):
             if flag:
                 self.itembar.items[self.itembar.slot_selected][0].update(self)
 
-        # Check if all enemies in current room are dead
-        if len(self.tilemap.enemyManager.enemies) <= 0:
-            if self.gameManager.get_meta("completed") != True and self.gameManager.get_meta('completed-text') != {}: 
-                self.hud.add('text-box', 
-                ClosableTextBox((self.game.dPos.TOP_CENTER[0], 42), self.game.scale, self.assetMap.gui['text-box'], self.assetMap.gui['close'], self.gameManager.get_meta("completed-text"))
-                             )
-                # Check if this is the first run, and display a message, if there is one (this is to avoid creating multiple text-boxes)
-                
-            self.tilemap.gameManager.add_meta("completed", True)
-
         # Update accessories
         self.inventory.update_accessories(self)
 
@@ -291,47 +311,81 @@ class Player(PhysicsEntity):
              
         self.tilemap.check_collisions(self.rect(), self)
 
-        for projectile in self.projectiles:
-            projectile.update(self)
-        
-    def render(self, disp, offset=(0, 0)):
-        """Render player and HUD elements."""
+        self.projectiles.update(self)
         
+    def render(self, disp, offset=(0, 0), alpha=1):
+        """Render the player, held item and projectiles."""
+        pos = self.render_pos(alpha)
         # Render item held and the player
         if self.itembar.items[self.itembar.slot_selected][0] != None and self.itembar.items[self.itembar.slot_selected][0].show_when_held:
             if self.flipx:
                 if self.flipy:
-                    blit(disp, pygame.transform.flip(self.itembar.items[self.itembar.slot_selected][0].icon, True, False), (self.pos[0]-offset[0], self.pos[1]-offset[1]+self.size[1]//2))
-                    super().render(disp, offset)
+                    blit(disp, pygame.transform.flip(self.itembar.items[self.itembar.slot_selected][0].icon, True, False), (pos[0]-offset[0], pos[1]-offset[1]+self.size[1]//2), LAYER_ENTITIES)
+                    super().render(disp, offset, alpha)
                 else:
-                    super().render(disp, offset)
-                    blit(disp, pygame.transform.flip(self.itembar.items[self.itembar.slot_selected][0].icon, True, False), (self.pos[0]-offset[0], self.pos[1]-offset[1]+self.size[1]//2))
+                    super().render(disp, offset, alpha)
+                    blit(disp, pygame.transform.flip(self.itembar.items[self.itembar.slot_selected][0].icon, True, False), (pos[0]-offset[0], pos[1]-offset[1]+self.size[1]//2), LAYER_ENTITIES)
             else:
                 if self.flipy:
-                    blit(disp, self.itembar.items[self.itembar.slot_selected][0].icon, (self.pos[0]-offset[0]+self.size[0]//2, self.pos[1]-offset[1]+self.size[1]//2))
-                    super().render(disp, offset)
+                    blit(disp, self.itembar.items[self.itembar.slot_selected][0].icon, (pos[0]-offset[0]+self.size[0]//2, pos[1]-offset[1]+self.size[1]//2), LAYER_ENTITIES)
+                    super().render(disp, offset, alpha)
                 else:
-                    super().render(disp, offset)
-                    blit(disp, self.itembar.items[self.itembar.slot_selected][0].icon, (self.pos[0]-offset[0]+self.size[0]//2, self.pos[1]-offset[1]+self.size[1]//2))
+                    super().render(disp, offset, alpha)
+                    blit(disp, self.itembar.items[self.itembar.slot_selected][0].icon, (pos[0]-offset[0]+self.size[0]//2, pos[1]-offset[1]+self.size[1]//2), LAYER_ENTITIES)
         else:
-            super().render(disp, offset)
+            super().render(disp, offset, alpha)
 
         if self.interaction:
-            blit(disp, self.assetMap.gui['interaction'], (self.pos[0]-offset[0], self.pos[1]-offset[1]))
+            blit(disp, self.assetMap.gui['interaction'], (pos[0]-offset[0], pos[1]-offset[1]), LAYER_ENTITIES)
 
         # Render the projectiles
-        for projectile in self.projectiles:
-            projectile.render(disp, offset)
-        render_font(self.gameManager.room_font, self.game.scale, (5, self.game.display.get_height()-(self.gameManager.room_font.get_height()//self.game.scale[1]+5)))
+        self.projectiles.render(disp, offset, alpha)
+
+    def render_hud(self, disp):
+        """Render HUD elements."""
+        self.room_label.text = self.gameManager.room_font
 
-                    
         # Render the HUD items
         self.hud.render(disp)
     
+class ManagerArray():
+    """Attribute stored in the EnemyManager arrays while the enemy is in a vectorized EnemyManager."""
+    def __init__(self, name):
+        self.name = name
+
+    def __get__(self, enemy, owner=None):
+        if enemy == None:
+            return self
+        if enemy.manager != None:
+            return enemy.manager.get(self.name, enemy.index)
+        return enemy.__dict__[self.name]
+
+    def __set__(self, enemy, value):
+        if enemy.manager != None:
+            enemy.manager.set(self.name, enemy.index, value)
+        else:
+            enemy.__dict__[self.name] = value
+
 class Enemy(PhysicsEntity):
     """Class for enemies."""
+    pos = ManagerArray('pos')
+    velocity = ManagerArray('velocity')
+    size = ManagerArray('size')
+    hitbox = ManagerArray('hitbox')
+    health = ManagerArray('health')
+    damaged = ManagerArray('damaged')
+    tick = ManagerArray('tick')
+    immunity_frames = ManagerArray('immunity_frames')
+    damage = ManagerArray('damage')
+    multiplier = ManagerArray('multiplier')
+    distance_from_target = ManagerArray('distance_from_target')
+    heading = ManagerArray('heading')
+
     def __init__ (self, sprite, damage=5, health=10, multiplier=0.25, distance_from_target=1, size=(32,32), hitbox=(24,24), meta={}, onDeath=None):
         """Initialize the enemy entity."""
+        # Set when added to a vectorized EnemyManager
+        self.manager = None
+        self.index = 0
         # Infromation to be set appon tilemap instilization
         self.pos = [0, 0]
         self.damage = damage
@@ -342,6 +396,7 @@ class Enemy(PhysicsEntity):
         self.damaged = False
         self.immunity_frames = 20
         self.tick = 21
+        self.heading = [0, 0] # Direction chosen by the last think, moved in every update
         
         super().__init__(None, self.pos, size, hitbox, sprite, multiplier, [])
     
@@ -351,17 +406,24 @@ class Enemy(PhysicsEntity):
             self.damaged = True
         
     def update(self, physicsEntity):
-        """Determine what direction the enemy needs to move in to go toward player."""
+        """Determine what direction the enemy needs to move in to go toward player, and move."""
+        self.think(physicsEntity)
+        self.act()
+
+    def think(self, physicsEntity):
+        """Determine what direction the enemy needs to move in to go toward player (stored in heading)."""
         # Dictionary for enemy movement
         pos = physicsEntity.pos
+        distance_from_target = self.distance_from_target
+        reach = 10 # Distance from the target that is close enough
 
-        # Increment ticks for immunity frames 
-        if self.damaged:
-            if self.tick >= self.immunity_frames:
-                self.tick = 0
-                self.damaged = False
-            else:
-                self.tick += 1
+        # Away from the player, follow the tilemap's flow field around walls (to the center of the next tile)
+        step = self.tilemap.flowField.step((self.pos[0] + self.size[0] / 2, self.pos[1] + self.size[1] / 2)) if self.tilemap != None else None
+        if step != None:
+            tile_size = self.tilemap.tile_size
+            pos = ((step[0] + 0.5) * tile_size - self.size[0] / 2, (step[1] + 0.5) * tile_size - self.size[1] / 2)
+            distance_from_target = 0
+            reach = 1
 
         movement = {
             'up' : False,
@@ -371,27 +433,40 @@ class Enemy(PhysicsEntity):
         }
 
         # Check horizontal movement
-        if (self.pos[0]-pos[0]-self.distance_from_target > 10):
+        if (self.pos[0]-pos[0]-distance_from_target > reach):
             movement['left'] = True
-        elif (self.pos[0]-pos[0]+self.distance_from_target < -10):
+        elif (self.pos[0]-pos[0]+distance_from_target < -reach):
             movement['right'] = True
         else:
             movement['right'] = False
             movement['left'] = False
            
         # Check vertical movement 
-        if (self.pos[1]-pos[1]-self.distance_from_target < -10):
+        if (self.pos[1]-pos[1]-distance_from_target < -reach):
             movement['down'] = True
-        elif (self.pos[1]-pos[1]+self.distance_from_target > 10):
+        elif (self.pos[1]-pos[1]+distance_from_target > reach):
             movement['up'] = True
         else:
             movement['up'] = False
             movement['down'] = False
 
-        # Check for collision with passed entity
-        if self.rect().colliderect(physicsEntity.rect()):
-            physicsEntity.health_bar.damage(self.damage)
+        self.heading = [movement['right'] - movement['left'], movement['down'] - movement['up']]
 
+    def act(self):
+        """Move the enemy in the direction chosen by the last think."""
+        # Increment ticks for immunity frames 
+        if self.damaged:
+            if self.tick >= self.immunity_frames:
+                self.tick = 0
+                self.damaged = False
+            else:
+                self.tick += 1
+
+        heading = self.heading
+        self.move(up=heading[1] < 0, down=heading[1] > 0, left=heading[0] < 0, right=heading[0] > 0)
+
+    def move(self, **movement):
+        """Move the enemy, colliding with the tilemap."""
         super().update(**movement)
     
     def on_death(self, *args):
@@ -410,50 +485,62 @@ class Projectile(PhysicsEntity):
         self.multiplier = 10
         self.onHit = onHit
         self.sprite = sprite
-        self.multiplier
+        self.image = sprite # Rotated sprite, set on release
         # Set on release
         self.pos = [0, 0]
         self.angle = 0 # Angle of projectile
 
-    def set(self, pos, angle):
+    def reuse(self, template):
+        """Copy the values of template, used when the projectile is reused from a pool."""
+        self.damage = template.damage
+        self.multiplier = template.multiplier
+        self.onHit = template.onHit
+        self.sprite = template.sprite
+
+    def set(self, pos, angle, image=None):
+        """Set the position and angle of the projectile, image is the sprite already rotated to the angle."""
         self.pos = pos
+        self.prev_pos = None
         self.angle = angle
-        self.sprite = pygame.transform.rotate(self.sprite, -math.degrees(self.angle))
+        if image == None:
+            image = pygame.transform.rotate(self.sprite, -math.degrees(self.angle))
+        self.image = image
 
     def rect(self):
-        return pygame.Rect(self.pos[0], self.pos[1], self.sprite.get_width(), self.sprite.get_height())
+        return pygame.Rect(self.pos[0], self.pos[1], self.image.get_width(), self.image.get_height())
+
+    def hit_wall(self, tilemap):
+        """Returns True if the projectile overlaps a solid tile."""
+        rect = self.rect()
+        for x in range(rect.left // tilemap.tile_size, (rect.right - 1) // tilemap.tile_size + 1):
+            for y in range(rect.top // tilemap.tile_size, (rect.bottom - 1) // tilemap.tile_size + 1):
+                if tilemap.is_solid((x, y)):
+                    return True
+        return False
 
     def update(self, player):
-        """Update the arrow."""
-        # Check for impacts with enemies
-        for enemy in player.tilemap.enemyManager.check_collisions(self.rect()):
-            enemy.do_damage(self.damage*player.damage_multiplier)
-            try: # Try-except to avoid having to fix a critical issue
-                player.projectiles.remove(self)
-            except: pass
-            break
-            
-        # Check for impacts with the wall
-        for tile in player.tilemap.get_solid_rects_around(self.pos):
-            if self.rect().colliderect(tile):
-                try: # Use try-except block to avoide having to fix a critical issue with collisions
-                    player.projectiles.remove(self)
-                except: pass
-        # Sets the arrow in direction toward the cursor
-        self.pos[0] += math.cos(self.angle) * self.multiplier
-        self.pos[1] += math.sin(self.angle) * self.multiplier
-
-    def render(self, disp, offset):
+        """Update the arrow, returns False once it has hit something."""
+        # Split the movement into steps no longer than the sprite, so fast projectiles can not pass through things
+        steps = max(1, math.ceil(self.multiplier / max(1, min(self.image.get_width(), self.image.get_height()))))
+        step = (math.cos(self.angle) * self.multiplier / steps, math.sin(self.angle) * self.multiplier / steps)
+        for i in range(steps):
+            # Check for impacts with enemies
+            enemies = player.tilemap.enemyManager.check_collisions(self.rect())
+            if enemies:
+                enemies[0].do_damage(self.damage*player.damage_multiplier)
+                return False
+            # Check for impacts with the wall
+            if self.hit_wall(player.tilemap):
+                return False
+            # Sets the arrow in direction toward the cursor
+            self.pos[0] += step[0]
+            self.pos[1] += step[1]
+        return True
+
+    def render(self, disp, offset, alpha=1):
         """Redner the arrow."""
-        
-        blit(disp, self.sprite, (self.pos[0]-offset[0], self.pos[1]-offset[1]))
+        pos = self.render_pos(alpha)
+        blit(disp, self.image, (pos[0]-offset[0], pos[1]-offset[1]), LAYER_PROJECTILES)
 
     def copy(self):
         return Projectile(self.sprite, self.damage, self.onHit)
-
-        
-
-        
-        
-    
-            
\ No newline at end of file
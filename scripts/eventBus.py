@@ -0,0 +1,40 @@
+"""
+This file contains the event bus, which tells the parts of the game that care when the state of a room changes.
+
+Events are only published when something actually changes, so nothing has to check the room state every frame.
+Each event passes its own arguments to the callbacks subscribed to it:
+    ROOM_COMPLETED (room)              - Every enemy in the room was defeated (or it had none).
+    CHEST_OPENED   (room, pos)         - A chest was opened for the first time.
+    NOTE_CHECKED   (room, pos)         - A note was read.
+    ENEMY_KILLED   (enemy, remaining)  - An enemy died, remaining is the number of enemies left in the room.
+    META_CHANGED   (room, key, value)  - A room meta value changed.
+
+--+ Classes +--
+EventBus() - Calls the callbacks subscribed to an event when it is published.
+"""
+# --------------------------------------------------------------------------------
+ROOM_COMPLETED = 'room-completed'
+CHEST_OPENED = 'chest-opened'
+NOTE_CHECKED = 'note-checked'
+ENEMY_KILLED = 'enemy-killed'
+META_CHANGED = 'meta-changed'
+
+class EventBus():
+    """Calls the callbacks subscribed to an event when it is published."""
+    def __init__(self):
+        """Initialize variables for EventBus"""
+        self.subscribers = {} # Callbacks for each event, in the order they subscribed, keyed by event
+
+    def subscribe(self, event, callback):
+        """Call callback with the event's arguments every time event is published"""
+        self.subscribers.setdefault(event, []).append(callback)
+
+    def unsubscribe(self, event, callback):
+        """Stop calling callback for event"""
+        if callback in self.subscribers.get(event, []):
+            self.subscribers[event].remove(callback)
+
+    def publish(self, event, *args):
+        """Call every callback subscribed to event with args"""
+        for callback in list(self.subscribers.get(event, [])): # Callbacks can subscribe and unsubscribe
+            callback(*args)
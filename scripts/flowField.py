@@ -0,0 +1,127 @@
+"""
+This file contains the flow field, which all enemies in a room use to find their way to the player.
+
+A breadth-first search from the player's tile over the solidity grid gives open tiles their distance to the
+player, and each tile stores the neighbouring tile that is closest to the player (its next step). Enemies read
+their next step with one lookup, so the cost doesn't grow with the number of enemies.
+
+The field is started again when the player moves to another tile, or a tile's solidity changes, but the work is
+only done for the tiles enemies are on: the search stops once it reaches the tile that was asked about, and
+carries on from where it stopped when a tile further away is asked about. A breadth-first search gives tiles
+their distance in order, so every tile closer to the player than the one asked about already has its final
+distance, and next steps are the same as with a search over the whole room. Next steps are worked out the first
+time a tile is asked about, then kept until the field is started again.
+
+--+ Classes +--
+FlowField(tilemap) - Distance field to the player's tile, with the next step from every tile.
+"""
+# --------------------------------------------------------------------------------
+# External imports
+from array import array
+from collections import deque
+
+# Neighbours of a tile, straight steps first so they are chosen over diagonal steps of the same distance
+NEIGHBOURS = ((0, -1), (0, 1), (-1, 0), (1, 0), (-1, -1), (1, -1), (-1, 1), (1, 1))
+DIRECT_DISTANCE = 1 # Tiles this close to the player's tile (or closer) chase the player directly
+NOT_FOUND = -2 # Value in next_cell for tiles whose next step was not worked out yet
+
+class FlowField():
+    """Distance field to the player's tile, with the next step from every tile."""
+    def __init__(self, tilemap):
+        """Initialize variables for FlowField"""
+        self.tilemap = tilemap
+        self.target = None # Tile the field leads to
+        self.width = 0
+        self.height = 0
+        self.distances = array('i') # Steps to the target for each tile, row by row (-1 when it wasn't reached yet)
+        self.next_cell = array('i') # Index of the next tile for each tile (-1 to chase the player directly, NOT_FOUND if not worked out)
+        self.queue = deque() # Tiles the search will carry on from
+        self.dirty = True
+        self.builds = 0 # Times the field was started, for benchmarks
+        self.searched = 0 # Tiles searched since the field was started, for benchmarks
+
+    def invalidate(self):
+        """Start the field again on the next update (the solidity grid changed)"""
+        self.dirty = True
+
+    def update(self, pos):
+        """Move the target to the tile at pos (in pixels), the field is only started again if it changed"""
+        target = (int(pos[0] // self.tilemap.tile_size), int(pos[1] // self.tilemap.tile_size))
+        if self.dirty or target != self.target:
+            self.target = target
+            self.build()
+
+    def build(self):
+        """Start the field from the target, the search is done as tiles are asked about"""
+        self.dirty = False
+        self.builds += 1
+        self.searched = 0
+        width = self.width = self.tilemap.size[0] + 1
+        height = self.height = self.tilemap.size[1] + 1
+        self.distances = array('i', [-1]) * (width * height)
+        self.next_cell = array('i', [NOT_FOUND]) * (width * height)
+        self.queue = deque()
+        x, y = self.target
+        if 0 <= x < width and 0 <= y < height:
+            # The target is searched from even if it is solid
+            self.distances[y * width + x] = 0
+            self.queue.append((x, y))
+        # (When the target is outside of the room nothing is reached, and enemies chase it directly)
+
+    def search(self, index):
+        """Carry on the breadth-first search (moving in straight steps) until the tile at index has its distance,
+        or every tile that can be reached has one"""
+        distances = self.distances
+        queue = self.queue
+        width, height = self.width, self.height
+        solid = self.tilemap.solid_grid
+        while distances[index] == -1 and queue:
+            x, y = queue.popleft()
+            self.searched += 1
+            distance = distances[y * width + x] + 1
+            for ox, oy in NEIGHBOURS[:4]:
+                nx, ny = x + ox, y + oy
+                if 0 <= nx < width and 0 <= ny < height:
+                    neighbour = ny * width + nx
+                    if distances[neighbour] == -1 and not solid[neighbour]:
+                        distances[neighbour] = distance
+                        queue.append((nx, ny))
+
+    def next_step(self, index):
+        """Returns the index of the next tile from the tile at index, -1 to chase the player directly"""
+        next_index = self.next_cell[index]
+        if next_index != NOT_FOUND:
+            return next_index
+        self.search(index)
+        distances = self.distances
+        width, height = self.width, self.height
+        solid = self.tilemap.solid_grid
+        distance = distances[index]
+        next_index = -1
+        if distance > DIRECT_DISTANCE:
+            # The neighbour closest to the target (diagonal steps can't cut the corner of a solid tile), every tile
+            # closer than this one already has its distance
+            x, y = index % width, index // width
+            best = distance
+            for ox, oy in NEIGHBOURS:
+                nx, ny = x + ox, y + oy
+                if not (0 <= nx < width and 0 <= ny < height):
+                    continue
+                neighbour = distances[ny * width + nx]
+                if neighbour == -1 or neighbour >= best:
+                    continue
+                if ox != 0 and oy != 0 and (solid[y * width + nx] or solid[ny * width + x]):
+                    continue
+                best = neighbour
+                next_index = ny * width + nx
+        self.next_cell[index] = next_index
+        return next_index
+
+    def step(self, pos):
+        """Returns the next tile to move to from the tile at pos (in pixels), None to chase the player directly"""
+        x, y = int(pos[0] // self.tilemap.tile_size), int(pos[1] // self.tilemap.tile_size)
+        if 0 <= x < self.width and 0 <= y < self.height:
+            index = self.next_step(y * self.width + x)
+            if index != -1:
+                return (index % self.width, index // self.width)
+        return None
@@ -28,6 +28,7 @@ class Item():
         self.meta = meta
 
         self.hidden = False
+        self.on_hide = None # Set by the tilemap to remove the item from its item grid
 
     def update(self, *args):
         """Updates the items attributes (ex: Give holder health boost)."""
@@ -41,6 +42,8 @@ class Item():
 
     def hide(self):
         self.hidden = True
+        if self.on_hide != None:
+            self.on_hide(self)
 
     def is_interactable(self):
         return self.interaction != None
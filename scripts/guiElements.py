@@ -11,7 +11,8 @@ import pygame
 import json
 
 # Internal imports
-from scripts.utils import blit, render_font
+from scripts.utils import blit, render_font, render_text, get_font
+from scripts.drawQueue import LAYER_HUD
 from scripts.itemAttributes import Accessory
 from scripts.utils import convert_time
 
@@ -36,9 +37,13 @@ class MenuItem():
     def render(self, disp):
         """Renders the menu item"""
         if self.center:
-            blit(disp, self.image, self.center_pos)
+            blit(disp, self.image, self.center_pos, LAYER_HUD)
         else:
-            blit(disp, self.image, self.pos)
+            blit(disp, self.image, self.pos, LAYER_HUD)
+
+    def state(self):
+        """Returns everything the item's rendering depends on, the item is only rendered again when this changes"""
+        return (self.image, self.pos, self.center_pos)
 
     def check_events(self):
         """Check the events for the menu item"""
@@ -73,6 +78,22 @@ class Button(MenuItem):
                 self.func()
 
 
+class Label(MenuItem):
+    """Text label, pos is the bottom left corner of the text"""
+
+    def __init__(self, pos, scale, text):
+        """Initializes the label with a rendered text surface"""
+        super().__init__(pos, (0, 0), scale, [], False)
+        self.text = text
+
+    def state(self):
+        """Returns the text surface, the label is only rendered again when it changes"""
+        return (self.text, self.pos)
+
+    def render(self, disp):
+        render_font(self.text, self.scale, (self.pos[0], self.pos[1]-(self.text.get_height()//self.scale[1])))
+
+
 class ItemBar(MenuItem):
     """Button menu item"""
 
@@ -85,21 +106,25 @@ class ItemBar(MenuItem):
         self.padding = 4
         self.spacing = 3
         self.counts = []
-        self.font = pygame.font.Font('freesansbold.ttf', int(8*self.scale[1]))
-        self.font_small = pygame.font.Font('freesansbold.ttf', int(5*self.scale[1]))
+        self.font_size = int(8*self.scale[1])
+        self.font_small_size = int(5*self.scale[1])
         self.items = [(None, 0)] * self.max_items
         self.image = image
         self.selected_image = selected_image
         for i in range(0, self.max_items):
-            self.counts.append(self.font_small.render("", True, (255, 250, 250)))
+            self.counts.append(render_text("", self.font_small_size))
         if self.items[self.slot_selected][0] != None:
-            self.text = self.font.render(self.items[self.slot_selected][0].display_name, True, (255, 250, 250))
+            self.text = render_text(self.items[self.slot_selected][0].display_name, self.font_size)
         else:
-            self.text = self.font.render("", True, (255, 250, 250))
+            self.text = render_text("", self.font_size)
+
+    def state(self):
+        """Returns everything the item bar's rendering depends on"""
+        return (self.slot_selected, tuple(self.items), tuple(self.counts), self.text)
 
     def update_counts(self):
         for i in range(0, self.max_items):
-            self.counts[i] = self.font_small.render(str(self.items[i][1]), True, (255, 250, 250))
+            self.counts[i] = render_text(str(self.items[i][1]), self.font_small_size)
 
     def check_events(self, event):
         """Checks the event for the element"""
@@ -120,7 +145,7 @@ class ItemBar(MenuItem):
                         self.slot_selected = index - 1
 
         if self.items[self.slot_selected][0] != None:
-            self.text = self.font.render(self.items[self.slot_selected][0].display_name, True, (255, 250, 250))
+            self.text = render_text(self.items[self.slot_selected][0].display_name, self.font_size)
         self.update_counts()
 
     def add_item(self, item, pos):
@@ -143,24 +168,24 @@ class ItemBar(MenuItem):
                     pos = (self.center_pos[0] +
                          (self.padding + self.icon_size * i + self.spacing * i),
                          self.center_pos[1] + self.padding)
-                    blit(disp, self.items[i][0].icon, pos)
+                    blit(disp, self.items[i][0].icon, pos, LAYER_HUD)
                     render_font(self.counts[i], self.scale, (pos[0]+2, pos[1]+2))
                     
                 else:
-                    disp.blit(
+                    blit(disp,
                         self.items[i][0].icon,
                         (self.pos[0] +
                          (self.padding + self.icon_size * i + self.spacing * i),
-                         self.pos[1] + self.padding))
+                         self.pos[1] + self.padding), LAYER_HUD)
             i += 1
 
             # Display selected icon
-            disp.blit(
+            blit(disp,
                 self.selected_image,
                 (self.center_pos[0] +
                  (self.padding - 1 + self.icon_size * self.slot_selected +
                   self.spacing * self.slot_selected),
-                 self.center_pos[1] + self.padding - 1))
+                 self.center_pos[1] + self.padding - 1), LAYER_HUD)
 
         # Display current items name above the item bar
         if self.items[self.slot_selected][0] != None:
@@ -170,12 +195,12 @@ class TextBox(MenuItem):
     """Class to create a text-box on the screen"""
     def __init__(self, pos, scale, image, text, center=True):
         super().__init__(pos, (160, 40), scale, [], center)
-        self.font = pygame.font.Font('freesansbold.ttf', 12)
+        self.font = get_font(12)
         self.padding = 4
         self.text = []
         self.image = image
         for t in text:
-            self.text.append(self.font.render(t, True, (255, 250, 250)))
+            self.text.append(render_text(t, 12))
 
     def render(self, disp):
         super().render(disp)
@@ -189,7 +214,7 @@ class ClosableTextBox(MenuItem):
     """Class to create a text-box on the screen"""
     def __init__(self, pos, scale, box_image, button_image, text, on_close=None, center=True, *args):
         super().__init__(pos, (box_image.get_width(), box_image.get_height()), scale, [pygame.MOUSEBUTTONDOWN], center)
-        self.font = pygame.font.Font('freesansbold.ttf', int(7*self.scale[1]))
+        self.font = get_font(7*self.scale[1])
         self.padding = 4
         self.image = box_image
         self.text = []
@@ -198,7 +223,7 @@ class ClosableTextBox(MenuItem):
         if self.center:
             self.button = Button((self.center_pos[0] + self.image.get_width()+self.padding*2, self.center_pos[1]+button_image.get_height()), (button_image.get_width(), button_image.get_height()), scale, button_image, "", self.close)
         for t in text:
-            self.text.append(self.font.render(t, True, (255, 250, 250)))
+            self.text.append(render_text(t, 7*self.scale[1]))
         
     def close(self):
         self.delete = True
@@ -224,8 +249,7 @@ class Inventory(MenuItem):
         super().__init__(pos, size, scale, [pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP], center=True)
         self.image = inventory_image
         self.selected_image = selected_image
-        self.font_title = pygame.font.Font('freesansbold.ttf', 8)
-        self.font_count = pygame.font.Font('freesansbold.ttf', int(4*self.scale[1]))
+        self.font_count_size = int(4*self.scale[1])
         self.columns = 4
         self.rows = 3
         self.padding = 3
@@ -244,12 +268,18 @@ class Inventory(MenuItem):
                 self.inventory[(x,y)] = (None, 0)
         for x in range(0, self.columns):
             for y in range(0, self.rows):
-                self.counts[(x,y)] = self.font_count.render("", True, (255, 250, 250))
+                self.counts[(x,y)] = render_text("", self.font_count_size)
         self.selcted = None        
 
+    def state(self):
+        """Returns everything the inventory's rendering depends on (and the mouse position while an item is held)"""
+        mouse_pos = self.game.mouse_pos() if self.held else None
+        return (tuple(self.inventory.values()), tuple(self.counts.values()), tuple(self.itembar.items), tuple(self.itembar.counts),
+                tuple(self.accsessories), self.selcted, self.held, mouse_pos)
+
     def update_count_fonts(self):
         for loc in self.inventory:
-            self.counts[loc] = self.font_count.render(str(self.inventory[loc][1]), True, (255, 250, 250))
+            self.counts[loc] = render_text(str(self.inventory[loc][1]), self.font_count_size)
 
     def update_accessories(self, *args):
         """Update each accessory"""
@@ -391,17 +421,17 @@ class Inventory(MenuItem):
             blit(disp, self.selected_image, (
                 self.center_pos[0]+self.padding+self.selcted[0][0]*(self.icon_size+2)+self.selcted[0][0],
                 self.center_pos[1]+11+self.selcted[0][1]*(self.icon_size+2)+self.selcted[0][1]
-            ))
+            ), LAYER_HUD)
         elif self.selcted != None and self.selcted[1] == 'itembar':
             blit(disp, self.selected_image, (
                 self.center_pos[0]+self.padding+self.selcted[0]*(self.icon_size+2)+self.selcted[0],
                 self.center_pos[1]+74
-            ))
+            ), LAYER_HUD)
         elif self.selcted != None and self.selcted[1] == 'accesories':
             blit(disp, self.selected_image, 
                  ((self.center_pos[0]+86),
-                  int((self.center_pos[0]+3+self.selcted[0]*(self.icon_size+2)+self.selcted[0]))-72)
-                )
+                  int((self.center_pos[0]+3+self.selcted[0]*(self.icon_size+2)+self.selcted[0]))-72),
+                 LAYER_HUD)
 
         # Render inventory items
         for loc in self.inventory:
@@ -410,7 +440,7 @@ class Inventory(MenuItem):
                     self.center_pos[0]+self.padding+loc[0]*(self.icon_size+2)+loc[0]+1,
                     self.center_pos[1]+11+loc[1]*(self.icon_size+2)+loc[1]+1
                 )
-                blit(disp, self.inventory[loc][0].icon, pos)
+                blit(disp, self.inventory[loc][0].icon, pos, LAYER_HUD)
                 render_font(self.counts[loc], self.scale, (pos[0]+2, pos[1]+2))
         # Render ItemBar items
         for loc in range(0, self.itembar.max_items):
@@ -419,7 +449,7 @@ class Inventory(MenuItem):
                     self.center_pos[0]+self.padding+loc*(self.icon_size+2)+loc+1,
                     self.center_pos[1]+75
                 )
-                blit(disp, self.itembar.items[loc][0].icon, (pos))
+                blit(disp, self.itembar.items[loc][0].icon, (pos), LAYER_HUD)
                 render_font(self.itembar.counts[loc], self.scale, (pos[0]+2, pos[1]+2))
 
         # Display Accessory icons
@@ -427,15 +457,15 @@ class Inventory(MenuItem):
             if self.accsessories[loc][0] != None:
                 blit(disp, self.accsessories[loc][0].icon, 
                  ((self.center_pos[0]+87),
-                  int((self.center_pos[0]+3+loc*(self.icon_size+2)+loc))-71)
-                )
+                  int((self.center_pos[0]+3+loc*(self.icon_size+2)+loc))-71),
+                 LAYER_HUD)
         
         # Display icon at mouse cursor when held
         if self.held and self.selcted != None and self.selcted[2][0] != None:
-            mx, my = pygame.mouse.get_pos()
+            mx, my = self.game.mouse_pos()
             icon = self.selcted[2][0].icon
             blit(disp, icon, (mx/self.scale[0]-int(icon.get_width()//2), 
-                              my/self.scale[1]-int(icon.get_height()//2)))
+                              my/self.scale[1]-int(icon.get_height()//2)), LAYER_HUD)
 
     def add(self, item):
         for i in range(0, len(self.itembar.items)):
@@ -457,8 +487,9 @@ class HealthBar(MenuItem):
         self.emblem = health_emblem
         self.empty_bar = empty_bar
         self.filled_bar = filled_bar
-        self.font = pygame.font.Font('freesansbold.ttf', int(8*self.scale[1]))
-        self.health_font = self.font.render(str(self.max_health)+"/"+str(self.max_health), True, (255, 250, 250))
+        self.font_size = int(8*self.scale[1])
+        self.health_shown = (health, max_health) # Health the health_font was rendered for
+        self.health_font = render_text(str(self.health)+"/"+str(self.max_health), self.font_size)
         self.health_per_bar = 10
         self.step = 21
         self.heal_tick = 0
@@ -477,17 +508,27 @@ class HealthBar(MenuItem):
                         disp, self.filled_bar, (
                             20 + self.center_pos[0] + self.step * i,
                             self.center_pos[1] + 5
-                        ))
+                        ), LAYER_HUD)
                 else:
                     blit(
                     disp, self.empty_bar, (
                         20 + self.center_pos[0] + self.step * i,
                         self.center_pos[1] + 5
-                    ))
-            blit(disp, self.emblem, self.center_pos)
-            render_font(self.font.render(str(self.health)+"/"+str(self.max_health), True, (255, 250, 250)), self.scale, 
+                    ), LAYER_HUD)
+            blit(disp, self.emblem, self.center_pos, LAYER_HUD)
+            if self.health_shown != (self.health, self.max_health):
+                # Only render the text again when the health changes
+                self.health_shown = (self.health, self.max_health)
+                self.health_font = render_text(str(self.health)+"/"+str(self.max_health), self.font_size)
+            render_font(self.health_font, self.scale, 
                         (self.center_pos[0]+20 ,self.center_pos[1] + 19))
-            
+
+    def state(self):
+        """Returns everything the health bar's rendering depends on"""
+        return (self.health, self.max_health)
+
+    def update(self):
+        """Update healing and immunity frames, once per simulation step"""
         # Increment ticks between healing, if needed    
         if self.health < self.max_health:
             if self.heal_tick >= self.ticks_between_healing:
@@ -533,7 +574,7 @@ class GameOver(MenuItem):
         
     def render(self, disp):
         """Render the images"""
-        blit(disp, self.image, (self.center_pos[0]-self.respawn_button.get_width()//4, self.center_pos[1]))
+        blit(disp, self.image, (self.center_pos[0]-self.respawn_button.get_width()//4, self.center_pos[1]), LAYER_HUD)
         self.button.render(disp)
         
     def check_events(self, event):
@@ -565,8 +606,6 @@ class EndScreen(MenuItem):
         self.small_font_size = 4
         self.font_spacing = 1
 
-        self.large_font = pygame.font.Font('freesansbold.ttf', int(self.large_font_size*self.scale[1]))
-        self.small_font = pygame.font.Font('freesansbold.ttf', int(self.small_font_size*self.scale[1]))
 
         items_found = 0
         total_items = 0
@@ -610,17 +649,17 @@ class EndScreen(MenuItem):
                 rooms_completed += 1
 
         # Render fonts to be displayed
-        self.chest_label = self.small_font.render(f"Chests Opened - {items_found}/{total_items}", True, (255, 250, 250))
-        self.chest_counts = self.small_font.render(f"{items_found}/{total_items}", True, (255, 250, 250))
+        self.chest_label = render_text(f"Chests Opened - {items_found}/{total_items}", self.small_font_size*self.scale[1])
+        self.chest_counts = render_text(f"{items_found}/{total_items}", self.small_font_size*self.scale[1])
 
-        self.rooms_label = self.small_font.render(f"Rooms Completed - {rooms_completed}/{total_rooms}", True, (255, 250, 250))
-        self.room_counts = self.small_font.render(f"{rooms_completed}/{total_rooms}", True, (255, 250, 250))
+        self.rooms_label = render_text(f"Rooms Completed - {rooms_completed}/{total_rooms}", self.small_font_size*self.scale[1])
+        self.room_counts = render_text(f"{rooms_completed}/{total_rooms}", self.small_font_size*self.scale[1])
 
-        self.notes_label = self.small_font.render(f"Notes Checked - {notes_checked}/{total_notes}", True, (255, 250, 250))
-        self.note_counts = self.small_font.render(f"{notes_checked}/{total_notes}", True, (255, 250, 250))
+        self.notes_label = render_text(f"Notes Checked - {notes_checked}/{total_notes}", self.small_font_size*self.scale[1])
+        self.note_counts = render_text(f"{notes_checked}/{total_notes}", self.small_font_size*self.scale[1])
 
-        self.percentage_label = self.large_font.render(f"{int(((items_found+notes_checked+rooms_completed)/(total_items+total_notes+total_rooms))*100)}%", True, (255, 250, 250))
-        self.time_label = self.small_font.render(f"{convert_time(pygame.time.get_ticks()//1000)}", True, (255, 250, 250))
+        self.percentage_label = render_text(f"{int(((items_found+notes_checked+rooms_completed)/(total_items+total_notes+total_rooms))*100)}%", self.large_font_size*self.scale[1])
+        self.time_label = render_text(f"{convert_time(pygame.time.get_ticks()//1000)}", self.small_font_size*self.scale[1])
 
 
     def check_events(self, event):
@@ -630,6 +669,9 @@ class EndScreen(MenuItem):
         
     def restart_game(self):
         """Method called when the user presses the restart button"""
+        # Clear the saved progress, and wait for it to be written before the game loads it again
+        self.player.gameManager.journal.reset()
+        self.player.gameManager.journal.close()
         self.player.game.__init__()
         
 
@@ -5,14 +5,29 @@
 """
 This program contains base classes to create gui objects eaily throughout the program
 
---+ Classes +-- 
-GUIManager() - Gui object, acts as a way to group GUI objects together
+Menu items are retained: each one is rendered into a cached image (and a cached full resolution text image)
+only when its state() changes, and the cached images are drawn every frame. The text images are kept on the
+font screen, which is only cleared and redrawn in the rectangles that changed.
 
+--+ Classes +--
+GUIManager() - Gui object, acts as a way to group GUI objects together
 """
 # --------------------------------------------------------------------------------
-# External imports 
+# External imports
 import pygame
 
+# Internal imports
+from scripts import utils
+from scripts.utils import blit, draw_call, set_font_target, merge_rects
+from scripts.drawQueue import LAYER_TINT, LAYER_HUD
+
+scratch = {} # Surfaces menu items are rendered onto before they are cached, keyed by size
+
+def get_scratch(size):
+    """Returns an empty surface of size to render onto, it must be cleared after use"""
+    if size not in scratch:
+        scratch[size] = pygame.Surface(size, pygame.SRCALPHA)
+    return scratch[size]
 
 class GUIManager():
     """Class to manager all menu items"""
@@ -20,14 +35,75 @@ class GUIManager():
         self.menu_items = {}
         self.ignore_events = []
         self.background_tint = False
+        self.cache = {} # (item, state, image, image position, text image, text rect) for each rendered item, keyed by item key
+        self.shown = [] # Keys of the items that were shown last frame
+        self.dirty_rects = [] # Rects of the font screen that changed last frame
+        self.redraw_rects = [] # Rects of the font screen that something else cleared, the text in them is drawn again
 
     def render(self, disp):
-        """Render all menu items"""
+        """Render all menu items, items are only rendered again when their state changes"""
         if self.background_tint:
-            disp.fill((10, 10, 10, 250), special_flags=pygame.BLEND_SUB)
-        for key, item in self.menu_items.items():
-            if key not in self.ignore_events:
-                item.render(disp)
+            draw_call(disp, lambda surface: surface.fill((10, 10, 10, 250), special_flags=pygame.BLEND_SUB), LAYER_TINT)
+
+        font_screen = utils.screen
+        dirty = self.redraw_rects
+        self.redraw_rects = []
+        shown = [key for key in self.menu_items if key not in self.ignore_events]
+        for key in shown:
+            item = self.menu_items[key]
+            state = item.state()
+            cache = self.cache.get(key)
+            if cache == None or cache[0] is not item or cache[1] != state:
+                self.cache[key] = (item, state) + self.render_item(item, disp.get_size(), font_screen)
+                dirty.append(self.cache[key][5])
+                if cache != None:
+                    dirty.append(cache[5])
+            elif key not in self.shown:
+                dirty.append(cache[5])
+        # Items that were hidden or removed
+        for key in self.shown:
+            if key not in shown and key in self.cache:
+                dirty.append(self.cache[key][5])
+        for key in list(self.cache):
+            if key not in self.menu_items:
+                del self.cache[key]
+        self.shown = shown
+
+        # Draw the cached images
+        for key in shown:
+            if self.cache[key][2] != None:
+                blit(disp, self.cache[key][2], self.cache[key][3], LAYER_HUD)
+
+        # Draw the text again only where it changed
+        self.dirty_rects = merge_rects(dirty)
+        for rect in self.dirty_rects:
+            font_screen.fill((0, 0, 0, 0), rect)
+            font_screen.set_clip(rect)
+            for key in shown:
+                if self.cache[key][4] != None and rect.colliderect(self.cache[key][5]):
+                    font_screen.blit(self.cache[key][4], self.cache[key][5])
+            font_screen.set_clip(None)
+
+    def redraw(self, rect):
+        """Draw the text in rect again on the next render (Called when something else cleared that part of the font screen)"""
+        if rect != None:
+            self.redraw_rects.append(rect)
+
+    def render_item(self, item, display_size, font_screen):
+        """Render item on its own, returns its (image, image position, text image, text rect)"""
+        surface = get_scratch(display_size)
+        text_surface = get_scratch(font_screen.get_size())
+        previous = set_font_target(text_surface)
+        item.render(surface)
+        set_font_target(previous)
+
+        rect = surface.get_bounding_rect()
+        image = surface.subsurface(rect).copy() if rect.width > 0 else None
+        surface.fill((0, 0, 0, 0), rect)
+        text_rect = text_surface.get_bounding_rect()
+        text = text_surface.subsurface(text_rect).copy() if text_rect.width > 0 else None
+        text_surface.fill((0, 0, 0, 0), text_rect)
+        return image, rect.topleft, text, text_rect
 
     def check_events(self, event):
         """Check for events"""
@@ -66,4 +142,4 @@ class GUIManager():
     def reset_ignore(self):
         """Remove keys from ignore check_events() list"""
         self.ignore_events = []
-            
+
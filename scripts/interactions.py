@@ -19,6 +19,7 @@ from scripts.guiElements import ClosableTextBox
 from scripts.entities import Projectile
 from scripts.itemAttributes import Accessory
 from scripts.utils import convert_time
+from scripts.eventBus import CHEST_OPENED, NOTE_CHECKED
 
 def game_end_screen(*args):
     """Show the game end screen"""
@@ -30,18 +31,18 @@ def game_end_screen(*args):
                   args[1]
                   ))
         
-def check_room_state(tile, disp, offset, tile_size, tilemap):
-    """Checks room metadata to figure out if tile should be converted to a chest."""
+def check_room_state(tile, tilemap, steps):
+    """Checks room metadata to figure out if tile should be converted to a chest (when placed, and when 'completed' changes)."""
     if tilemap.gameManager.get_meta("completed") == True:
         chest = tilemap.assetMap.tiles['chest'].copy()
         # Set specific tiledata from old tile
         chest.meta.update(tile.meta)
         chest.pos = tile.pos
         chest.meta = chest.meta.copy()
-        tilemap.tilemap[tile.pos] = chest
+        tilemap.add_tile(tile.pos, chest)
 
-def check_room_state_doors(tile, disp, offset, tile_size, tilemap):
-    """Checks room metadata to figure out if tile should be converted to a chest."""
+def check_room_state_doors(tile, tilemap, steps):
+    """Checks room metadata to figure out if tile should be converted to a door (when placed, and when 'completed' changes)."""
     if tilemap.gameManager.get_meta("completed") == True:
         door = tilemap.assetMap.tiles['door'].copy()
         door.meta.update(tile.meta)
@@ -49,7 +50,7 @@ def check_room_state_doors(tile, disp, offset, tile_size, tilemap):
         door.pos = tile.pos
         door.meta = door.meta.copy()
         door.variant = tile.variant # Set tile varient
-        tilemap.tilemap[tile.pos] = door
+        tilemap.add_tile(tile.pos, door)
 
 def open_chest(tile, player):
     """Handles what will happen when a chest is interacted with"""
@@ -62,7 +63,7 @@ def open_chest(tile, player):
             for i in range(0, tile.meta.get('ammount', 1)):
                 player.inventory.add(player.tilemap.assetMap.items[tile.meta.get('item', 'NaI')].copy())
             tile.meta['opened'] = True
-            player.gameManager.add_meta(tile.pos, {'opened' : True})
+            player.gameManager.events.publish(CHEST_OPENED, player.gameManager.current_room, tile.pos)
             tile.variant = 1
             # Display a message for the player
             
@@ -95,7 +96,7 @@ def open_chest(tile, player):
             for i in range(0, tile.meta.get('ammount', 1)):
                 player.inventory.add(player.tilemap.assetMap.items[tile.meta.get('item', 'NaI')].copy())
             tile.meta['opened'] = True
-            player.gameManager.add_meta(tile.pos, {'opened' : True})
+            player.gameManager.events.publish(CHEST_OPENED, player.gameManager.current_room, tile.pos)
             tile.variant = 1
 
             # Display message set in tilemap
@@ -111,8 +112,8 @@ def open_chest(tile, player):
         # Display a message fro the player
         player.hud.add("text-box", ClosableTextBox((player.game.dPos.TOP_CENTER[0], 42), player.game.scale, player.assetMap.gui['text-box'], player.assetMap.gui['close'], ["This chest is empty!"]))
 
-def check_chest_state(tile, *args):
-    """Check the state of the chest, set variant"""
+def check_chest_state(tile, tilemap, steps):
+    """Check the state of the chest, set variant (when placed)"""
     if tile.meta['opened']:
         tile.variant = 1
 
@@ -120,13 +121,12 @@ def fire_arrow(item, event, player):
     """Fire an arrow at event position, using metadata from item"""
     if item.meta['tick'] == 0:
         # Create an arrow, set trjectory and pos, append to render list
-        pos = (player.game.sWidth//2, player.game.sHeight//2) # Base player position as center of screen
+        pos = (player.game.dWidth//2, player.game.dHeight//2) # Base player position as center of the scaled display
         print("player: ", pos, " Mouse:", event.pos)
-        arrow = player.tilemap.assetMap.entities['arrow'].copy()
         tPos = player.pos.copy()
-        arrow.set([tPos[0]+16, tPos[1]+13], math.atan2((event.pos[1]-pos[1]), (event.pos[0]-pos[0]))) # Set arrow information, shift arrow start pos in a stupid way
+        arrow = player.projectiles.fire(player.tilemap.assetMap.entities['arrow'], [tPos[0]+16, tPos[1]+13],
+                                        math.atan2((event.pos[1]-pos[1]), (event.pos[0]-pos[0]))) # Set arrow information, shift arrow start pos in a stupid way
         print(arrow, "has been added to projectiles")
-        player.projectiles.append(arrow)
         item.meta['tick'] = 1 # set to one to activate cooldown
 
 def arrow_hit(arrow, entity):
@@ -138,7 +138,7 @@ def show_text_box(item, player):
     # Remove old text-box, if there is one
     player.hud.remove("text-box")
     player.hud.add("text-box", ClosableTextBox((player.game.dPos.TOP_CENTER[0], 42), player.game.scale, player.assetMap.gui['text-box'], player.assetMap.gui['close'], item.meta['text']))
-    player.gameManager.add_meta(item.pos, {'checked' : True})
+    player.gameManager.events.publish(NOTE_CHECKED, player.gameManager.current_room, item.pos)
 
 def on_interact_trash(item, player):
     for attribute in player.itembar.items[player.itembar.slot_selected][0].attributes:
@@ -158,8 +158,10 @@ def set_room(tile, *args):
     else:
         args[1].pos = [(args[1].tilemap.size[0]//2)*args[1].tilemap.tile_size+args[1].tilemap.tile_size//2, (args[1].tilemap.size[1]//2)*args[1].tilemap.tile_size]
 
-    if args[1].gameManager.get_meta("text") != {}:
-        args[1].hud.add("text-box", ClosableTextBox((args[1].game.dPos.TOP_CENTER[0], 42), args[1].game.scale, args[1].assetMap.gui['text-box'], args[1].assetMap.gui['close'], args[1].gameManager.get_meta("text")))
+    text = args[1].gameManager.get_meta("text")
+    if text != {}:
+        args[1].hud.add("text-box", ClosableTextBox((args[1].game.dPos.TOP_CENTER[0], 42), args[1].game.scale, args[1].assetMap.gui['text-box'], args[1].assetMap.gui['close'], text))
+    args[1].gameManager.check_completed() # Rooms without enemies are completed when entered
    
     if tile.meta.get('tag', None) != None:
         args[1].assetMap.tags.get(tile.meta.get('tag'))(*args)
@@ -186,8 +188,24 @@ def spike_damage(tile, *args):
     if tile.collision_interactable:
         args[1].health_bar.damage(tile.meta['damage'])
 
+def spike_wake(tile, tilemap, steps):
+    """Run the spike timer for the steps since it last ran, returns the steps until the spikes next change"""
+    # Only the last step can change the spikes (it was scheduled for it), the steps before only count
+    if steps > 1:
+        if tile.meta['offset'] >= 0:
+            tile.meta['offset'] -= steps - 1
+        tile.meta['tick'] += steps - 1
+    spike_tick(tile)
+
+    # Steps until the tick reaches the time of the current state, or the offset runs out
+    limit = tile.meta['spike-time'] if tile.collision_interactable else tile.meta['cooldown']
+    delay = max(1, limit - tile.meta['tick'] + 1)
+    if tile.meta['offset'] >= 0:
+        delay = min(delay, tile.meta['offset'] + 1)
+    return delay
+
 def spike_tick(tile, *args):
-    """Increment spike ticks"""
+    """Increment spike ticks (one simulation step)"""
     # Check offset
     if tile.meta['offset'] >= 0:
         tile.meta['offset'] -= 1
@@ -16,15 +16,25 @@ from scripts.entities import Player
 from scripts.utils import blit
 from scripts.tiles import Tile, InteractableTile, TileGroup
 from scripts.enemyManager import EnemyManager
+from scripts.roomLoader import RoomLoader
+from scripts.flowField import FlowField
+from scripts.aiScheduler import AIScheduler
+from scripts.tileScheduler import TileScheduler
+from scripts.drawQueue import LAYER_TILES, LAYER_DECOR, LAYER_ITEMS
 
 # External imports
 import pygame
 import math
-import json
+import copy
+import sys
 
 POSITIONS_AROUND = ((0, 1), (0, -1), (-1, 0), (1, 0), (-1, -1), (-1, 1),
                     (1, -1), (1, 1), (0, 0))
 BASE_TILEMAP_PATH = "data/rooms/"
+CHUNK_SIZE = 8 # Width and height of a render chunk, in tiles
+# Attributes that make up a loaded room, saved and restored by the room cache
+ROOM_STATE = ('tilemap', 'decor', 'items', 'size', 'tile_groups', 'enemyManager', 'chunks', 'hooked_tiles', 'tileScheduler',
+              'interactable_tiles', 'item_grid', 'item_positions', 'solid_grid', 'solid_rects', 'solid_rects_around')
 
 
 class Tilemap():
@@ -41,80 +51,273 @@ class Tilemap():
         self.size = (0, 0)
         self.tile_groups = {}
         self.gameManager = None
-        self.enemyManager = EnemyManager()
+        self.aiScheduler = AIScheduler()  # Chooses the enemies that think each step, shared by every room
+        self.enemyManager = EnemyManager(self)
+        self.chunks = {}  # Positions of tiles, decor and items, grouped by chunk for culling
+        self.hooked_tiles = []  # Positions of tiles with an on_render hook, ran by update()
+        self.tileScheduler = TileScheduler()  # Runs tile behaviour (on_wake) when it is due, ran by update()
+        self.interactable_tiles = {}  # InteractableTile objects, keyed by position
+        self.item_grid = {}  # Positions of items, keyed by every tile cell the item overlaps
+        self.item_positions = {}  # Positions of each item in the item grid, keyed by item
+        self.solid_grid = bytearray()  # 1 for solid tiles, row by row, sized from self.size
+        self.solid_rects = []  # Collision Rect for each solid cell in solid_grid, None otherwise
+        self.solid_rects_around = {}  # Tuple of the solid Rects around a cell, keyed by cell
+        self.near_solid_grid = None  # Solid tiles spread to the tiles around them, made by the EnemyManager when needed
+        self.roomLoader = RoomLoader(BASE_TILEMAP_PATH)  # Reads rooms in the background before they are loaded
+        self.flowField = FlowField(self)  # Next step to the player from every tile, shared by the enemies
 
     def load(self, filename, gameManager):
-        """Load the tilemap from a provided dictionary"""
-        with open(BASE_TILEMAP_PATH + filename, "r") as f:
-            tile_data = json.load(f) 
+        """Load the tilemap from a room file (decoded by the room loader)"""
+        room = self.roomLoader.get(filename)
         # Reset tilemaps
         self.tilemap = {}
         self.decor = {}  # Just images, can have floating point positions
         self.items = {}  # Item objects to be rendered on the tilemap
         self.tile_groups = {}
         self.gameManager = gameManager
-        self.enemyManager = EnemyManager()
-        
-        # Load information from Tilemap
-        for k, v in tile_data.get('tilemap', {}).items():
-            # Load tile information from file and assetMap
-            tile = self.assetMap.tiles[v.get('id', 'NaT')].copy()
-            tile.pos = tuple([int(x) for x in k.split(";")])
-            tile.variant = v.get('variant', 0)
-            tile.meta.update(v.get('meta', {}))
-            tile.meta.update(gameManager.get_meta(tile.pos)) # Update with data from rooms.json
-            
-            tile.meta = tile.meta.copy()
-            # Put the tile into the tilemap
-            self.tilemap[tuple([int(x) for x in k.split(";")])] = tile
+        self.enemyManager = EnemyManager(self)
+        self.chunks = {}
+        self.hooked_tiles = []
+        self.tileScheduler = TileScheduler()
+        self.interactable_tiles = {}
+        self.item_grid = {}
+        self.item_positions = {}
 
         # Load TileGroups
-        for group_id, g in tile_data.get('tile-groups', {}).items():
+        groups = []
+        for group_id, meta in room['groups']:
             group = TileGroup()
             group.id = group_id
-            group.meta = tile_data['tile-groups'][group_id].get('meta', {})
-
-            # Load tiles into group
-            for pos, t in tile_data['tile-groups'][group_id].get('tiles', {}).items():
-                # Load tile information from file and assetMap
-                tile = self.assetMap.tiles[t.get('id', 'NaT')].copy()
-                tile.pos = tuple([int(x) for x in pos.split(";")])
-                tile.variant = t.get('variant', 0)
-                tile.meta.update(t.get('meta', {}))
-                tile.meta.update(g.get('meta', {}))
-                tile.meta = tile.meta.copy()
-                tile.tile_group = group_id # Group id reference 
-                # Put the tile into the tilemap
-                self.tilemap[tuple([int(x) for x in pos.split(";")])] = tile
-                # Add tile to group aswell
-                group.add(tile)
-
+            group.meta = copy.deepcopy(meta)
+            groups.append(group)
             # Add group to dict
             self.tile_groups[group_id] = group
+
+        # Load information from Tilemap (tiles in a group come after the others)
+        tiles = room['tiles']
+        for i in range(len(tiles['x'])):
+            # Load tile information from the room and assetMap
+            tile = self.assetMap.tiles[room['ids'][tiles['id'][i]]].copy()
+            tile.pos = (tiles['x'][i], tiles['y'][i])
+            tile.variant = tiles['variant'][i]
+            if tiles['meta'][i] != -1:
+                tile.meta.update(copy.deepcopy(room['metas'][tiles['meta'][i]]))
+            if tiles['group'][i] == -1:
+                tile.meta.update(gameManager.get_meta(tile.pos)) # Update with data from rooms.json
+            else:
+                group = groups[tiles['group'][i]]
+                tile.meta.update(group.meta)
+                tile.tile_group = group.id # Group id reference 
+                # Add tile to group aswell
+                group.add(tile)
+            
+            tile.meta = tile.meta.copy()
+            # Put the tile into the tilemap
+            self.tilemap[tile.pos] = tile
+            self.chunk_tile(tile)
+            self.index_tile(tile)
             
-        for k, v in tile_data.get('decor', {}).items():
+        decor = room['decor']
+        for i in range(len(decor['x'])):
             # Load decor from file, these are just images
-            self.decor[tuple([float(x) for x in k.split(";")
-                              ])] = self.assetMap.decor[v]
+            self.add_decor((decor['x'][i], decor['y'][i]), self.assetMap.decor[room['ids'][decor['id'][i]]])
 
-        for k, v in tile_data.get('items', {}).items():
+        items = room['items']
+        for i in range(len(items['x'])):
             # Load items from tilemap (these are objects derived from the Item class)
-            self.items[tuple([float(x) for x in k.split(";")
-                              ])] = self.assetMap.items[v.get('id', 'NaI')]
+            self.add_item((items['x'][i], items['y'][i]), self.assetMap.items[room['ids'][items['id'][i]]])
          
         # Load enemies from tilemap
         if gameManager.get_meta('completed') != True: # Check if enemies have already been defeated
-            for k, v in tile_data.get('entities', {}).items():
-                # Load decor from file, these are just images
-                entity = self.assetMap.entities[v.get('id', 'NaN')].copy()
-                tpos = list([float(x) for x in k.split(";")])
-                entity.pos = [tpos[0] * self.tile_size, tpos[1] * self.tile_size]
+            entities = room['entities']
+            for i in range(len(entities['x'])):
+                entity = self.assetMap.entities[room['ids'][entities['id'][i]]].copy()
+                entity.pos = [entities['x'][i] * self.tile_size, entities['y'][i] * self.tile_size]
                 entity.tilemap = self
                 
                 self.enemyManager.add(entity)
 
         # Set size variable
         self.size = (max([x[0] for x in self.tilemap]), max([y[1] for y in self.tilemap]))
+        self.build_solid_grid()
+        # Schedule tile behaviour, once every tile is placed
+        for tile in self.tilemap.values():
+            self.tileScheduler.add(tile)
+
+    def get_state(self):
+        """Returns the state of the loaded room, so it can be restored later without loading it again"""
+        return {name: getattr(self, name) for name in ROOM_STATE}
+
+    def set_state(self, state):
+        """Restores a room state returned by get_state()"""
+        for name in ROOM_STATE:
+            setattr(self, name, state[name])
+        self.near_solid_grid = None
+        self.flowField.invalidate()
+
+    def state_memory(self, state):
+        """Returns an estimate of the bytes used by a room state (images shared with the asset map are not counted)"""
+        memory = 0
+        # Pre-rendered layers
+        for chunk in state['chunks'].values():
+            for layer in chunk['layers']:
+                if layer != None:
+                    memory += layer.get_width() * layer.get_height() * layer.get_bytesize()
+        # Lookup tables and grids
+        for name in ROOM_STATE:
+            if isinstance(state[name], (dict, list, bytearray)):
+                memory += sys.getsizeof(state[name])
+        memory += sum(sys.getsizeof(rect) for rect in state['solid_rects'] if rect != None)
+        # Tiles, items and enemies
+        for obj in list(state['tilemap'].values()) + list(state['items'].values()) + state['enemyManager'].enemies:
+            memory += sys.getsizeof(obj) + sys.getsizeof(getattr(obj, '__dict__', {}))
+        for array in getattr(state['enemyManager'], 'arrays', {}).values():
+            memory += array.nbytes
+        return memory
+
+    def get_chunk(self, chunk_pos):
+        """Returns the chunk at the given chunk position, creating it if it does not exist"""
+        if chunk_pos not in self.chunks:
+            # 'layers' stores the pre-rendered static tiles and decor, rebuilt when 'dirty' is set
+            self.chunks[chunk_pos] = {'tiles': [], 'decor': [], 'items': [], 'dynamic': [], 'layers': (None, None), 'dirty': True}
+        return self.chunks[chunk_pos]
+
+    def get_chunks_in_rect(self, rect):
+        """Returns a list of chunk positions that overlap the passed in Rect (in pixels)"""
+        chunk_px = CHUNK_SIZE * self.tile_size
+        return [
+            (x, y)
+            for y in range(int(rect.top // chunk_px), int((rect.bottom - 1) // chunk_px) + 1)
+            for x in range(int(rect.left // chunk_px), int((rect.right - 1) // chunk_px) + 1)
+        ]
+
+    def chunk_tile(self, tile):
+        """Adds the tile position to the chunk it is in"""
+        chunk = self.get_chunk((tile.pos[0] // CHUNK_SIZE, tile.pos[1] // CHUNK_SIZE))
+        chunk['dirty'] = True
+        if tile.pos not in chunk['tiles']:
+            chunk['tiles'].append(tile.pos)
+        if tile.on_render != None and tile.pos not in self.hooked_tiles:
+            self.hooked_tiles.append(tile.pos)
+
+    def chunk_image(self, layer, pos, image):
+        """Adds the position of a decor or item image to every chunk the image overlaps"""
+        rect = pygame.Rect(pos[0] * self.tile_size, pos[1] * self.tile_size, image.get_width(), image.get_height())
+        for chunk_pos in self.get_chunks_in_rect(rect):
+            chunk = self.get_chunk(chunk_pos)
+            chunk['dirty'] = True
+            if pos not in chunk[layer]:
+                chunk[layer].append(pos)
+
+    def index_tile(self, tile):
+        """Keeps the interactable tile index up to date with the tile at tile.pos"""
+        if type(tile) == InteractableTile:
+            self.interactable_tiles[tile.pos] = tile
+        else:
+            self.interactable_tiles.pop(tile.pos, None)
+
+    def get_item_cells(self, pos, item):
+        """Returns the tile cells that the item at pos overlaps"""
+        left = int(pos[0] * self.tile_size)
+        top = int(pos[1] * self.tile_size)
+        return [
+            (x, y)
+            for x in range(left // self.tile_size, (left + item.icon.get_width() - 1) // self.tile_size + 1)
+            for y in range(top // self.tile_size, (top + item.icon.get_height() - 1) // self.tile_size + 1)
+        ]
+
+    def index_item(self, pos, item):
+        """Adds the item at pos to the item grid"""
+        for cell in self.get_item_cells(pos, item):
+            self.item_grid.setdefault(cell, []).append(pos)
+        self.item_positions.setdefault(item, []).append(pos)
+        item.on_hide = self.unindex_item
+
+    def unindex_item(self, item):
+        """Removes every position of the item from the item grid (Called when the item is hidden)"""
+        for pos in self.item_positions.pop(item, []):
+            for cell in self.get_item_cells(pos, item):
+                if pos in self.item_grid.get(cell, []):
+                    self.item_grid[cell].remove(pos)
+
+    def build_solid_grid(self):
+        """Builds the solidity grid and the collision Rects for every solid tile from (0, 0) to self.size"""
+        width = self.size[0] + 1
+        self.solid_grid = bytearray(width * (self.size[1] + 1))
+        self.solid_rects = [None] * len(self.solid_grid)
+        self.solid_rects_around = {}
+        for pos, tile in self.tilemap.items():
+            if tile.solid and 0 <= pos[0] <= self.size[0] and 0 <= pos[1] <= self.size[1]:
+                self.solid_grid[pos[1] * width + pos[0]] = 1
+                self.solid_rects[pos[1] * width + pos[0]] = pygame.Rect(pos[0] * self.tile_size, pos[1] * self.tile_size,
+                                                                        self.tile_size, self.tile_size)
+        self.near_solid_grid = None
+        self.flowField.invalidate()
+
+    def update_solid_grid(self, pos):
+        """Updates the solidity grid for the tile at pos"""
+        if 0 <= pos[0] <= self.size[0] and 0 <= pos[1] <= self.size[1]:
+            index = pos[1] * (self.size[0] + 1) + pos[0]
+            if bool(self.tilemap[pos].solid) != (self.solid_grid[index] == 1):
+                self.near_solid_grid = None
+                self.flowField.invalidate() # Paths through this tile changed
+            if self.tilemap[pos].solid:
+                self.solid_grid[index] = 1
+                self.solid_rects[index] = pygame.Rect(pos[0] * self.tile_size, pos[1] * self.tile_size, self.tile_size, self.tile_size)
+            else:
+                self.solid_grid[index] = 0
+                self.solid_rects[index] = None
+        elif pos[0] >= 0 and pos[1] >= 0:
+            # The tile is past the end of the grid, so the room has grown
+            self.size = (max(self.size[0], pos[0]), max(self.size[1], pos[1]))
+            self.build_solid_grid()
+            return
+        # Tiles at negative positions are not in the grid (is_solid looks them up), only their cached Rects change
+        # Clear the cached Rects of every cell that has this tile around it
+        for position in POSITIONS_AROUND:
+            self.solid_rects_around.pop((pos[0] + position[0], pos[1] + position[1]), None)
+
+    def is_solid(self, pos):
+        """Returns True if the tile at the given tile position is solid"""
+        if 0 <= pos[0] <= self.size[0] and 0 <= pos[1] <= self.size[1]:
+            return self.solid_grid[pos[1] * (self.size[0] + 1) + pos[0]] == 1
+        # The grid starts at (0, 0), tiles at negative positions are looked up in the tilemap
+        tile = self.tilemap.get(tuple(pos), None)
+        return tile != None and bool(tile.solid)
+
+    def get_solid_rect(self, pos):
+        """Returns the collision Rect of the solid tile at the given tile position (The Rect may be shared)"""
+        if 0 <= pos[0] <= self.size[0] and 0 <= pos[1] <= self.size[1]:
+            return self.solid_rects[pos[1] * (self.size[0] + 1) + pos[0]]
+        return pygame.Rect(pos[0] * self.tile_size, pos[1] * self.tile_size, self.tile_size, self.tile_size)
+
+    def build_chunk_layers(self, chunk_pos):
+        """Pre-renders the static tiles and the decor of a chunk onto layer surfaces"""
+        chunk = self.chunks[chunk_pos]
+        chunk_px = CHUNK_SIZE * self.tile_size
+        origin = (chunk_pos[0] * chunk_px, chunk_pos[1] * chunk_px)
+        tile_layer = None
+        decor_layer = None
+        chunk['dynamic'] = [] # Tiles that change, and have to be rendered every frame
+
+        for pos in chunk['tiles']:
+            tile = self.tilemap[pos]
+            if tile.is_static():
+                if tile_layer == None:
+                    tile_layer = pygame.Surface((chunk_px, chunk_px), pygame.SRCALPHA)
+                tile.render(tile_layer, origin, self.tile_size, self)
+            else:
+                chunk['dynamic'].append(pos)
+
+        for pos in chunk['decor']:
+            if decor_layer == None:
+                decor_layer = pygame.Surface((chunk_px, chunk_px), pygame.SRCALPHA)
+            # Snap to a whole pixel first, so decor spanning several chunks lines up
+            blit(decor_layer, self.decor[pos], (int(pos[0] * self.tile_size) - origin[0],
+                                                int(pos[1] * self.tile_size) - origin[1]))
+
+        chunk['layers'] = (tile_layer, decor_layer)
+        chunk['dirty'] = False
 
     def get_tile(self, pos):
         """Returns tile at given position"""
@@ -131,13 +334,17 @@ class Tilemap():
         return tiles
 
     def get_solid_rects_around(self, pos):
-        """Returns a list of rects areound the given position"""
-        return [
-            pygame.Rect(tile.pos[0] * self.tile_size,
-                        tile.pos[1] * self.tile_size, self.tile_size,
-                        self.tile_size) for tile in self.get_tiles_around(pos)
-            if tile != None and tile.solid
-        ]
+        """Returns a tuple of rects areound the given position (The Rects are shared, do not modify them)"""
+        pos = (int(pos[0] // self.tile_size), int(pos[1] // self.tile_size))
+        rects = self.solid_rects_around.get(pos, None)
+        if rects == None:
+            # Build the tuple once, it is reused until a tile around pos changes
+            rects = tuple(
+                self.get_solid_rect((pos[0] + position[0], pos[1] + position[1]))
+                for position in POSITIONS_AROUND if self.is_solid((pos[0] + position[0], pos[1] + position[1]))
+            )
+            self.solid_rects_around[pos] = rects
+        return rects
     
     def get_rects_around(self, pos):
         """Returns a list of rects areound the given position"""
@@ -150,11 +357,17 @@ class Tilemap():
 
     def get_interactable_tiles(self):
         """Returns a list of all interactable tiles in tilemdap"""
-        return [x for x in self.tilemap.values() if type(x) == InteractableTile]
+        return list(self.interactable_tiles.values())
 
     def get_interactable_tiles_around(self, pos):
         """Returns a list of interactable tiles around pos"""
-        return [x for x in self.get_tiles_around(pos) if type(x) == InteractableTile]
+        pos = (int(pos[0] // self.tile_size), int(pos[1] // self.tile_size))
+        tiles = []
+        for position in POSITIONS_AROUND:
+            tile = self.interactable_tiles.get((pos[0] + position[0], pos[1] + position[1]), None)
+            if tile != None:
+                tiles.append(tile)
+        return tiles
     
     def get_interactable_only_tiles_around(self, pos):
         """Returns a list of interactable tiles around pos"""
@@ -168,12 +381,21 @@ class Tilemap():
         """Returns a list of interactable tiles around pos that are collision only."""
         return [x for x in self.get_interactable_tiles_around(pos) if type(x) == InteractableTile and x.interactable == False or x.collision_interactable]
     
+    def get_collided_item_positions(self, rect):
+        """Returns a list of the positions of items that collide with the passed in Rect"""
+        positions = []
+        for x in range(rect.left // self.tile_size, (rect.right - 1) // self.tile_size + 1):
+            for y in range(rect.top // self.tile_size, (rect.bottom - 1) // self.tile_size + 1):
+                for pos in self.item_grid.get((x, y), []):
+                    item = self.items[pos]
+                    if (pos not in positions and not item.hidden and 
+                        pygame.Rect(pos[0]*self.tile_size, pos[1]*self.tile_size, item.icon.get_width(), item.icon.get_height()).colliderect(rect)):
+                        positions.append(pos)
+        return positions
+
     def get_collided_items(self, rect):
         """Returns a list of Item objects that collide with the passed in Rect"""
-        return [
-            item for pos, item in self.items.items() 
-            if pygame.Rect(pos[0]*self.tile_size, pos[1]*self.tile_size, item.icon.get_width(), item.icon.get_height()).colliderect(rect) and not item.hidden
-        ]
+        return [self.items[pos] for pos in self.get_collided_item_positions(rect)]
     
     def closest_interactable_tile(self, pos):
         pos = (int(pos[0]+self.tile_size//2), int(pos[1]+self.tile_size//2))
@@ -181,15 +403,6 @@ class Tilemap():
         # Return closest interactable tile
         return distances.get(min(*distances.keys(), default=0), None)
     
-    def closest_interactable_item(self, pos):
-        pos = (int(pos[0]+self.tile_size//2), int(pos[1]+self.tile_size//2))
-        distances = {
-            abs(math.hypot(pos, (k[0] + int(item.icon.get_width()//2), k[1] + int(item.icon.get_height()//2)))) : item 
-            for k, item in self.items.items() if item.is_interactable()
-        }
-        # Return closest interactable item
-        return distances.get(min(*distances.keys(), default=0), None)
-
     def closest_interactable(self, position):
         pos = (int(position[0]+self.tile_size//2), int(position[1]+self.tile_size//2))
         distances = {
@@ -197,12 +410,10 @@ class Tilemap():
                            for tile in self.get_interactable_only_tiles_around(pos)
         }
         # Return closest interactable tile
-        items_collided = self.get_collided_items(pygame.Rect(position[0], position[1], self.tile_size, self.tile_size)) 
-        distances.update({
-            abs(math.hypot(k[0] + int(item.icon.get_width()//2) - pos[0], k[1] + int(item.icon.get_height()//2) - pos[1])) : item 
-            for k, item in self.items.items() 
-            if item != None and item.is_interactable() and item in items_collided
-        })
+        for k in self.get_collided_item_positions(pygame.Rect(position[0], position[1], self.tile_size, self.tile_size)):
+            item = self.items[k]
+            if item.is_interactable():
+                distances[abs(math.hypot(k[0] + int(item.icon.get_width()//2) - pos[0], k[1] + int(item.icon.get_height()//2) - pos[1]))] = item
 
         return distances.get(min(distances.keys(), default=0), None)
 
@@ -220,24 +431,50 @@ class Tilemap():
         else:
             tile.pos = pos # Make sure the pos for both is equal
             self.tilemap[pos] = tile
+            self.chunk_tile(tile)
+            self.index_tile(tile)
+            self.update_solid_grid(pos)
+            self.tileScheduler.add(tile)
 
     def add_decor(self, pos, decor):
         """Adds surface to decor at given position(can be a float)"""
         self.decor[pos] = decor
+        self.chunk_image('decor', pos, decor)
 
     def add_item(self, pos, item):
         """Adds item to be rendered on Tilemap (Note: input should be a copy)"""
         self.items[pos] = item
+        self.chunk_image('items', pos, item.icon)
+        self.index_item(pos, item)
+
+    def update(self):
+        """Run the tile behaviour that is due (timers, room state checks), and the on_render hooks, once per simulation step"""
+        self.tileScheduler.update(self)
+        for pos in list(self.hooked_tiles): # Hooks can replace tiles
+            self.tilemap[pos].update(self.tile_size, self)
 
     def render(self, disp, offset):
-        """Render the tilemap"""
+        """Render the tilemap, only visiting the chunks that are on screen"""
+        chunk_positions = [c for c in self.get_chunks_in_rect(pygame.Rect(offset, disp.get_size())) if c in self.chunks]
 
-        for tile in self.tilemap.values():
-            tile.render(disp, offset, self.tile_size, self)
-        for pos, dec in self.decor.items():
-            blit(disp, dec, (pos[0] * self.tile_size - offset[0],
-                             pos[1] * self.tile_size - offset[1]))
-        for pos, item in self.items.items():
+        chunk_px = CHUNK_SIZE * self.tile_size
+        for chunk_pos in chunk_positions:
+            chunk = self.chunks[chunk_pos]
+            if chunk['dirty']:
+                self.build_chunk_layers(chunk_pos)
+            # Draw the pre-rendered static tiles, then the tiles that can change
+            if chunk['layers'][0] != None:
+                blit(disp, chunk['layers'][0], (chunk_pos[0] * chunk_px - offset[0], chunk_pos[1] * chunk_px - offset[1]), LAYER_TILES)
+            for pos in chunk['dynamic']:
+                self.tilemap[pos].draw(disp, offset, self.tile_size, self)
+
+        for chunk_pos in chunk_positions:
+            if self.chunks[chunk_pos]['layers'][1] != None:
+                blit(disp, self.chunks[chunk_pos]['layers'][1], (chunk_pos[0] * chunk_px - offset[0], chunk_pos[1] * chunk_px - offset[1]), LAYER_DECOR)
+
+        # Items can span multiple chunks, dict.fromkeys() removes duplicates while keeping the order
+        for pos in dict.fromkeys(pos for c in chunk_positions for pos in self.chunks[c]['items']):
+            item = self.items[pos]
             if not item.hidden:
                 blit(disp, item.icon, (pos[0] * self.tile_size - offset[0],
-                                    pos[1] * self.tile_size - offset[1]))
\ No newline at end of file
+                                    pos[1] * self.tile_size - offset[1]), LAYER_ITEMS)
\ No newline at end of file
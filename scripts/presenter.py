@@ -0,0 +1,95 @@
+"""
+This file contains the presenter, which scales the display onto the screen and shows it.
+
+The display is checked for changes in bands of rows (with a checksum of each band), and only the parts of
+the screen under changed bands or changed HUD text (and the profiler overlay) are drawn and updated. When
+nothing changed (an open inventory, the game-over screen) nothing is scaled and nothing is presented.
+The display is scaled with an Upscaler, into a buffer that is made once instead of a new surface every frame.
+
+--+ Classes +--
+Presenter(screen, display, font_screen, upscaler) - Scales the display onto the screen, and returns the rects to update.
+"""
+# --------------------------------------------------------------------------------
+# External imports
+import pygame, zlib
+
+# Internal imports
+from scripts.utils import merge_rects
+
+BAND_HEIGHT = 8 # Rows of the display in each checksum band
+BACKGROUND = (20, 20, 20) # Color of the screen around the display
+
+class Presenter():
+    """Scales the display onto the screen, and returns the rects to update."""
+    def __init__(self, screen, display, font_screen, upscaler):
+        """Initialize variables for Presenter, upscaler scales the display to where it is shown on the screen"""
+        self.screen = screen
+        self.display = display
+        self.font_screen = font_screen
+        self.upscaler = upscaler
+        self.dest = upscaler.dest
+        self.scaled = upscaler.buffer
+        self.checksums = [] # Checksum of each band of the display last frame
+        self.full = True # Draw the whole screen on the next present
+
+    def invalidate(self):
+        """Draw the whole screen on the next present (after the window was covered, etc.)"""
+        self.full = True
+
+    def changed_bands(self):
+        """Returns the (first row, last row + 1) of each run of display bands that changed since the last call"""
+        pitch = self.display.get_pitch()
+        height = self.display.get_height()
+        view = self.display.get_view('0')
+        with memoryview(view) as buffer:
+            checksums = [zlib.crc32(buffer[y * pitch:min(y + BAND_HEIGHT, height) * pitch]) for y in range(0, height, BAND_HEIGHT)]
+        del view # Release the view, so the display is unlocked
+
+        bands = []
+        for index, checksum in enumerate(checksums):
+            if index >= len(self.checksums) or self.checksums[index] != checksum:
+                start, end = index * BAND_HEIGHT, min((index + 1) * BAND_HEIGHT, height)
+                if bands and bands[-1][1] == start:
+                    bands[-1] = (bands[-1][0], end)
+                else:
+                    bands.append((start, end))
+        self.checksums = checksums
+        return bands
+
+    def present(self, dirty_rects=()):
+        """Draw the changed parts of the screen, returns the rects to pass to pygame.display.update (None for the whole screen)
+
+        dirty_rects are the rects of the font screen that changed"""
+        bands = self.changed_bands()
+        if self.full:
+            self.full = False
+            self.screen.fill(BACKGROUND)
+            self.upscaler.upscale(self.display)
+            self.screen.blit(self.scaled, self.dest)
+            self.screen.blit(self.font_screen, (0, 0))
+            return None
+
+        rects = []
+        if bands and self.upscaler.partial:
+            # Scale only the bands that changed
+            for band in bands:
+                rects.append(self.upscaler.upscale(self.display, band).move(self.dest.topleft))
+        elif bands:
+            self.upscaler.upscale(self.display)
+            scale = self.upscaler.scale[1]
+            margin = self.upscaler.margin
+            for start, end in bands:
+                # Rows on the edges of a band can be changed by the rows next to it (rounding, or the filter)
+                top = max(0, int(start * scale) - margin)
+                bottom = min(self.dest.height, int(end * scale) + margin + 1)
+                rects.append(pygame.Rect(self.dest.x, self.dest.y + top, self.dest.width, bottom - top))
+        rects.extend(dirty_rects)
+
+        rects = merge_rects([rect.clip(self.screen.get_rect()) for rect in rects])
+        for rect in rects:
+            if not self.dest.contains(rect):
+                self.screen.fill(BACKGROUND, rect)
+            area = rect.clip(self.dest)
+            self.screen.blit(self.scaled, area, area.move(-self.dest.x, -self.dest.y))
+            self.screen.blit(self.font_screen, rect, rect)
+        return rects
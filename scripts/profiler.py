@@ -0,0 +1,150 @@
+"""
+This file contains the frame profiler, which times each phase of the game loop in-process.
+
+The game loop calls mark(name) at the end of each phase, so a phase's time is the time since the previous mark.
+The last HISTORY frames are kept in ring buffers for percentiles and the overlay graph, and every phase can
+also be recorded as a Chrome trace (open the file in chrome://tracing or https://ui.perfetto.dev).
+
+--+ Classes +--
+Profiler(active, trace_file, scale) - Times the phases of each frame, draws an overlay and writes Chrome traces.
+"""
+# --------------------------------------------------------------------------------
+# External imports
+from array import array
+import json, time
+import pygame
+
+# Internal imports
+from scripts.utils import render_text
+
+HISTORY = 240 # Frames kept in the ring buffers
+MAX_TRACE_EVENTS = 500000 # Events kept for the trace file, older events are dropped
+OVERLAY_REFRESH = 30 # Frames between updates of the overlay text
+GRAPH_SIZE = (240, 60) # Size of the frame time graph (one pixel column per frame)
+GRAPH_MS = 33.3 # Frame time at the top of the graph
+COLOR = (255, 250, 250)
+TARGET_COLOR = (90, 200, 90)
+
+class Profiler():
+    """Times the phases of each frame, draws an overlay and writes Chrome traces."""
+    def __init__(self, active, trace_file=None, scale=1):
+        """Initialize variables for Profiler, nothing is timed when it is not active, scale is the scale of the HUD text"""
+        self.active = active
+        self.scale = scale
+        self.show_overlay = active
+        self.trace_file = trace_file
+        self.phases = {} # Ring buffer of times (in seconds) for each phase, keyed by phase name
+        self.frames = array('d', [0.0] * HISTORY) # Ring buffer of whole frame times
+        self.index = 0 # Next position in the ring buffers
+        self.count = 0 # Frames recorded, up to HISTORY
+        self.frame = {} # Time of each phase in the current frame
+        self.frame_start = 0
+        self.last = 0
+        self.trace = [] # Complete ('X') trace events, in microseconds
+        self.trace_start = time.perf_counter()
+        self.text = [] # Rendered overlay lines, refreshed every OVERLAY_REFRESH frames
+        self.rect = None # Rect of the font screen the overlay was drawn over last frame
+
+    def begin_frame(self):
+        """Start timing a frame"""
+        if self.active:
+            self.frame_start = self.last = time.perf_counter()
+
+    def mark(self, name):
+        """End the phase called name, timed from the last mark (or the start of the frame)"""
+        if self.active:
+            now = time.perf_counter()
+            self.frame[name] = self.frame.get(name, 0) + now - self.last
+            if self.trace_file != None:
+                self.trace.append((name, self.last, now - self.last))
+            self.last = now
+
+    def end_frame(self):
+        """Finish the frame, and store its phase times in the ring buffers"""
+        if not self.active:
+            return
+        for name in self.frame:
+            if name not in self.phases:
+                self.phases[name] = array('d', [0.0] * HISTORY)
+        for name, times in self.phases.items():
+            times[self.index] = self.frame.get(name, 0)
+        self.frames[self.index] = self.last - self.frame_start
+        self.index = (self.index + 1) % HISTORY
+        self.count = min(self.count + 1, HISTORY)
+        self.frame = {}
+        if len(self.trace) > MAX_TRACE_EVENTS:
+            del self.trace[:len(self.trace) - MAX_TRACE_EVENTS]
+
+    def history(self, times):
+        """Returns the recorded values of a ring buffer, oldest first"""
+        if self.count < HISTORY:
+            return times[:self.count]
+        return times[self.index:] + times[:self.index]
+
+    def percentiles(self, name=None, fractions=(0.5, 0.95, 0.99)):
+        """Returns the percentiles (in milliseconds) of a phase over the recorded frames, or of whole frames if name is None"""
+        values = sorted(self.history(self.frames if name == None else self.phases[name]))
+        if not values:
+            return [0.0 for fraction in fractions]
+        return [values[min(len(values) - 1, int(fraction * len(values)))] * 1000 for fraction in fractions]
+
+    def check_events(self, event):
+        """Toggle the overlay with F3"""
+        if self.active and event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+            self.show_overlay = not self.show_overlay
+
+    def clear(self, font_screen):
+        """Clear the overlay drawn last frame from the font screen, returns the rect that was cleared (None if there was none)"""
+        rect, self.rect = self.rect, None
+        if rect != None:
+            font_screen.fill((0, 0, 0, 0), rect)
+        return rect
+
+    def render(self, font_screen, telemetry=None, stats=None):
+        """Draw the overlay (phase percentiles, telemetry values, stats and a frame time graph) onto the font screen, over the HUD,
+        returns the rect that was drawn over (None if nothing was drawn), stats is a dictionary of counts that change every frame"""
+        if not (self.active and self.show_overlay):
+            return None
+        surface = font_screen
+        graph_size = (int(GRAPH_SIZE[0] * self.scale), int(GRAPH_SIZE[1] * self.scale))
+        # Rendering text is slow, so the text is only refreshed every few frames
+        if self.count % OVERLAY_REFRESH == 0 or not self.text:
+            lines = ["phase           p50 / p95 / p99 ms"]
+            for name in self.phases:
+                lines.append("%-14s %5.2f / %5.2f / %5.2f" % ((name,) + tuple(self.percentiles(name))))
+            p50, p95, p99 = self.percentiles()
+            lines.append("%-14s %5.2f / %5.2f / %5.2f" % ("frame", p50, p95, p99))
+            if telemetry != None:
+                lines.extend(f"{k}: {v}" for k, v in telemetry.telemetry_data.items())
+            if stats != None:
+                lines.extend(f"{k}: {v}" for k, v in stats.items())
+            self.text = [render_text(line, int(12 * self.scale), COLOR) for line in lines]
+
+        x, y = surface.get_width() - graph_size[0] - 10, 10
+        rect = pygame.Rect(x, y, graph_size[0], 0)
+        for line in self.text:
+            rect.union_ip(surface.blit(line, (surface.get_width() - line.get_width() - 10, y)))
+            y += line.get_height() + 2
+
+        # Frame time graph, one column for each recorded frame
+        y += 4
+        pygame.draw.rect(surface, (0, 0, 0, 128), (x, y, graph_size[0], graph_size[1])) # See-through, the font screen keeps its alpha
+        target = y + graph_size[1] - int(graph_size[1] * 16.7 / GRAPH_MS)
+        pygame.draw.line(surface, TARGET_COLOR, (x, target), (x + graph_size[0] - 1, target))
+        frames = self.history(self.frames)
+        if len(frames) > 1:
+            points = [(x + i * graph_size[0] // HISTORY, y + graph_size[1] - min(graph_size[1], int(graph_size[1] * frame * 1000 / GRAPH_MS)))
+                      for i, frame in enumerate(frames)]
+            pygame.draw.lines(surface, COLOR, False, points)
+        self.rect = rect.union(pygame.Rect(x, y, graph_size[0], graph_size[1]))
+        return self.rect
+
+    def save_trace(self, path=None):
+        """Write the recorded phases to a Chrome trace JSON file (trace_file if path is None)"""
+        path = path or self.trace_file
+        if path == None:
+            return
+        events = [{'name': name, 'ph': 'X', 'ts': (start - self.trace_start) * 1000000, 'dur': duration * 1000000, 'pid': 0, 'tid': 0}
+                  for name, start, duration in self.trace]
+        with open(path, "w") as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
@@ -0,0 +1,78 @@
+"""
+Projectile manager class, holds a fixed-size pool of projectiles that are reused when fired.
+
+Free slots are kept in a list, so firing and removing a projectile never searches or shifts a list.
+Rotated sprites are cached by angle (rounded to ANGLE_STEPS directions), so firing does not rotate an image.
+
+--+ Classes +--
+ProjectileManager() - Pool of projectiles, updates and renders the active projectiles
+"""
+# --------------------------------------------------------------------------------
+# External imports
+import pygame, math
+
+# Number of directions rotated sprites are cached for
+ANGLE_STEPS = 64
+
+class ProjectileManager():
+    """Pool of projectiles, updates and renders the active projectiles"""
+    def __init__(self, capacity=64):
+        """Initialize variables for ProjectileManager"""
+        self.capacity = capacity
+        self.slots = [None] * capacity # Projectile objects, reused when fired again
+        self.free = list(range(capacity - 1, -1, -1)) # Indexes of free slots, popped from the end
+        self.active = [] # Indexes of the active slots, in the order they were fired
+        self.rotations = {} # Rotated sprites, keyed by (sprite, angle step)
+
+    def rotated(self, sprite, angle):
+        """Returns the sprite rotated to the closest cached angle (angle in radians)"""
+        step = round(angle / (2 * math.pi) * ANGLE_STEPS) % ANGLE_STEPS
+        key = (sprite, step)
+        if key not in self.rotations:
+            self.rotations[key] = pygame.transform.rotate(sprite, -step * 360 / ANGLE_STEPS)
+        return self.rotations[key]
+
+    def fire(self, template, pos, angle):
+        """Fire a projectile like template from pos at angle, returns the projectile"""
+        if not self.free:
+            # Pool is full, reuse the oldest projectile
+            self.free.append(self.active.pop(0))
+        index = self.free.pop()
+        if self.slots[index] == None or type(self.slots[index]) != type(template):
+            self.slots[index] = template.copy()
+        projectile = self.slots[index]
+        projectile.reuse(template)
+        projectile.set(pos, angle, self.rotated(template.sprite, angle))
+        self.active.append(index)
+        return projectile
+
+    def update(self, player):
+        """Update the active projectiles, freeing the ones that hit something"""
+        active = []
+        for index in self.active:
+            if self.slots[index].update(player):
+                active.append(index)
+            else:
+                self.free.append(index)
+        self.active = active
+
+    def store_positions(self):
+        """Store projectile positions before a simulation step, so rendering can interpolate between steps"""
+        for index in self.active:
+            self.slots[index].store_pos()
+
+    def render(self, disp, offset, alpha=1):
+        """Render the active projectiles"""
+        for index in self.active:
+            self.slots[index].render(disp, offset, alpha)
+
+    def clear(self):
+        """Free every active projectile"""
+        self.free.extend(reversed(self.active))
+        self.active = []
+
+    def __len__(self):
+        return len(self.active)
+
+    def __iter__(self):
+        return iter([self.slots[index] for index in self.active])
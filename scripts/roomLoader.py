@@ -0,0 +1,210 @@
+"""
+This file contains the compiled room format, and the loader that reads rooms in the background.
+
+A compiled room (.room) stores tiles, decor, items and entities as typed arrays, and everything else
+(tile ids, meta, tile groups) in a JSON side-table. It is written next to the room's JSON file, and is
+only used while the MD5 of the JSON file matches the one stored in it, so editing a room never loads stale data.
+
+Compile rooms with:  python -m scripts.roomLoader data/rooms
+
+--+ Classes +--
+RoomLoader() - Reads and decodes rooms on a background thread before they are needed
+"""
+# --------------------------------------------------------------------------------
+# External imports
+from array import array
+import hashlib, json, os, queue, struct, sys, threading
+
+MAGIC = b"ROOM"
+VERSION = 1
+HEADER = struct.Struct("<4sH16s") # Magic, version, MD5 of the source JSON
+COUNT = struct.Struct("<I")
+
+# Typed arrays for each section of a room, (name, array typecode)
+TILE_ARRAYS = (('x', 'h'), ('y', 'h'), ('id', 'H'), ('variant', 'H'), ('meta', 'i'), ('group', 'h'))
+OBJECT_ARRAYS = (('x', 'd'), ('y', 'd'), ('id', 'H'))
+
+def room_path(filename, extension):
+    """Returns the path of a room file with the extension changed"""
+    return os.path.splitext(filename)[0] + extension
+
+def from_json(tile_data):
+    """Returns the decoded room for the loaded JSON of a room"""
+    ids = []
+    def id_index(tile_id):
+        if tile_id not in ids:
+            ids.append(tile_id)
+        return ids.index(tile_id)
+
+    room = {
+        'ids': ids,
+        'metas': [],
+        'groups': [],
+        'tiles': {name: array(typecode) for name, typecode in TILE_ARRAYS},
+        'decor': {name: array(typecode) for name, typecode in OBJECT_ARRAYS},
+        'items': {name: array(typecode) for name, typecode in OBJECT_ARRAYS},
+        'entities': {name: array(typecode) for name, typecode in OBJECT_ARRAYS}
+    }
+
+    def add_tile(key, t, group):
+        x, y = [int(v) for v in key.split(";")]
+        room['tiles']['x'].append(x)
+        room['tiles']['y'].append(y)
+        room['tiles']['id'].append(id_index(t.get('id', 'NaT')))
+        room['tiles']['variant'].append(t.get('variant', 0))
+        if t.get('meta', {}) != {}:
+            room['metas'].append(t['meta'])
+            room['tiles']['meta'].append(len(room['metas']) - 1)
+        else:
+            room['tiles']['meta'].append(-1)
+        room['tiles']['group'].append(group)
+
+    def add_object(section, key, object_id):
+        x, y = [float(v) for v in key.split(";")]
+        room[section]['x'].append(x)
+        room[section]['y'].append(y)
+        room[section]['id'].append(id_index(object_id))
+
+    # Tiles in the tilemap come first, then the tiles of each group (the same order Tilemap.load used)
+    for k, v in tile_data.get('tilemap', {}).items():
+        add_tile(k, v, -1)
+    for group_id, g in tile_data.get('tile-groups', {}).items():
+        room['groups'].append([group_id, g.get('meta', {})])
+        for k, t in g.get('tiles', {}).items():
+            add_tile(k, t, len(room['groups']) - 1)
+
+    for k, v in tile_data.get('decor', {}).items():
+        add_object('decor', k, v)
+    for k, v in tile_data.get('items', {}).items():
+        add_object('items', k, v.get('id', 'NaI'))
+    for k, v in tile_data.get('entities', {}).items():
+        add_object('entities', k, v.get('id', 'NaN'))
+
+    return room
+
+def encode(room, digest):
+    """Returns the compiled bytes of a decoded room, digest is the MD5 of the source JSON"""
+    side_table = json.dumps({'ids': room['ids'], 'metas': room['metas'], 'groups': room['groups']}).encode("utf-8")
+    data = [HEADER.pack(MAGIC, VERSION, digest), COUNT.pack(len(side_table)), side_table]
+    for section, arrays in (('tiles', TILE_ARRAYS), ('decor', OBJECT_ARRAYS), ('items', OBJECT_ARRAYS), ('entities', OBJECT_ARRAYS)):
+        data.append(COUNT.pack(len(room[section]['x'])))
+        for name, typecode in arrays:
+            values = array(typecode, room[section][name])
+            if sys.byteorder == "big":
+                values.byteswap() # Compiled rooms are always little-endian
+            data.append(values.tobytes())
+    return b"".join(data)
+
+def decode(data, digest=None):
+    """Returns the decoded room from compiled bytes, or None if it is not a compiled room for digest"""
+    if len(data) < HEADER.size:
+        return None
+    magic, version, room_digest = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION or (digest != None and digest != room_digest):
+        return None
+
+    offset = HEADER.size
+    size = COUNT.unpack_from(data, offset)[0]
+    offset += COUNT.size
+    room = json.loads(data[offset:offset + size].decode("utf-8"))
+    offset += size
+    for section, arrays in (('tiles', TILE_ARRAYS), ('decor', OBJECT_ARRAYS), ('items', OBJECT_ARRAYS), ('entities', OBJECT_ARRAYS)):
+        count = COUNT.unpack_from(data, offset)[0]
+        offset += COUNT.size
+        room[section] = {}
+        for name, typecode in arrays:
+            values = array(typecode)
+            values.frombytes(data[offset:offset + count * values.itemsize])
+            if sys.byteorder == "big":
+                values.byteswap()
+            offset += count * values.itemsize
+            room[section][name] = values
+    return room
+
+def read_room(path):
+    """Returns the decoded room at path (a JSON room), using the compiled room when it is up to date"""
+    digest = None
+    source = None
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            source = f.read()
+        digest = hashlib.md5(source).digest()
+
+    compiled = room_path(path, ".room")
+    if os.path.exists(compiled):
+        with open(compiled, "rb") as f:
+            room = decode(f.read(), digest)
+        if room != None:
+            return room
+
+    if source == None:
+        raise FileNotFoundError(path)
+    return from_json(json.loads(source))
+
+def compile_room(path):
+    """Compiles the JSON room at path into a .room file next to it, returns the path written"""
+    with open(path, "rb") as f:
+        source = f.read()
+    compiled = room_path(path, ".room")
+    with open(compiled, "wb") as f:
+        f.write(encode(from_json(json.loads(source)), hashlib.md5(source).digest()))
+    return compiled
+
+class RoomLoader():
+    """Reads and decodes rooms on a background thread before they are needed"""
+    def __init__(self, base_path=""):
+        """Initialize variables for RoomLoader"""
+        self.base_path = base_path
+        self.rooms = {} # Decoded rooms (or the error raised reading them), keyed by filename
+        self.loading = {} # Events set once a room has been read, keyed by filename
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def prefetch(self, filenames):
+        """Start reading the rooms in the background, rooms read earlier that are not in filenames are dropped"""
+        with self.lock:
+            for filename in list(self.rooms):
+                if filename not in filenames:
+                    del self.rooms[filename]
+            for filename in filenames:
+                if filename not in self.rooms and filename not in self.loading:
+                    self.loading[filename] = threading.Event()
+                    self.queue.put(filename)
+        if self.thread == None and not self.queue.empty():
+            self.thread = threading.Thread(target=self.run, name="RoomLoader", daemon=True)
+            self.thread.start()
+
+    def get(self, filename):
+        """Returns the decoded room, waiting for it if it is being read and reading it now if it was not prefetched"""
+        with self.lock:
+            event = self.loading.get(filename)
+        if event != None:
+            event.wait()
+        with self.lock:
+            room = self.rooms.pop(filename, None)
+        if room == None or isinstance(room, Exception):
+            # Not prefetched, or it failed in the background (read again to raise the error here)
+            room = read_room(self.base_path + filename)
+        return room
+
+    def run(self):
+        """Background thread, reads the queued rooms"""
+        while True:
+            filename = self.queue.get()
+            try:
+                room = read_room(self.base_path + filename)
+            except Exception as e:
+                room = e
+            with self.lock:
+                self.rooms[filename] = room
+                self.loading.pop(filename).set()
+
+if __name__ == "__main__":
+    # Compile every JSON room in the given files or directories
+    for target in sys.argv[1:] or ["data/rooms"]:
+        paths = [target]
+        if os.path.isdir(target):
+            paths = [os.path.join(root, name) for root, dirs, files in os.walk(target) for name in sorted(files) if name.endswith(".json")]
+        for path in paths:
+            print("Compiled", compile_room(path))
@@ -0,0 +1,126 @@
+"""
+This file contains the save journal, which keeps the progress made in a save (room meta changes) on disk.
+
+Changes are added to an append-only journal (progress.journal, one JSON entry per line) by a background
+thread, so saving never blocks a frame. Every COMPACT_ENTRIES entries the journal is compacted into a
+snapshot (progress.json) and emptied. Loading reads the snapshot, then the journal on top of it, so at most
+the entries that were still being written are lost when the game crashes.
+
+Entries are [room, key, value]. Keys can be tile positions (tuples), which JSON can't use as object keys,
+so they are stored as lists and turned back into tuples when loaded.
+
+--+ Classes +--
+SaveJournal(save_file, persistent) - Loads the progress of a save, and writes changes to it on a background thread.
+"""
+# --------------------------------------------------------------------------------
+# External imports
+import copy, json, os, queue, threading
+
+SNAPSHOT = "progress.json"
+JOURNAL = "progress.journal"
+COMPACT_ENTRIES = 64 # Journal entries written before the journal is compacted into the snapshot
+RESET = object() # Queued to clear all progress
+
+def encode_key(key):
+    """Returns the key in a form JSON can store"""
+    return list(key) if isinstance(key, tuple) else key
+
+def decode_key(key):
+    """Returns the key as it was before encode_key()"""
+    return tuple(key) if isinstance(key, list) else key
+
+class SaveJournal():
+    """Loads the progress of a save, and writes changes to it on a background thread."""
+    def __init__(self, save_file, persistent=True):
+        """Initialize variables for SaveJournal, save_file is the save's directory (nothing is loaded or saved if not persistent)"""
+        self.persistent = persistent
+        self.snapshot_path = os.path.join(save_file, SNAPSHOT)
+        self.journal_path = os.path.join(save_file, JOURNAL)
+        self.progress = {} # Value of each (room, key), only used by the background thread after load()
+        self.journal_entries = 0 # Entries in the journal since the last compaction
+        self.queue = queue.Queue()
+        self.thread = None
+
+    def load(self):
+        """Returns the saved progress as a list of (room, key, value), and starts the background thread"""
+        if not self.persistent:
+            return []
+        entries = []
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path) as f:
+                entries.extend(json.load(f))
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path) as f:
+                for line in f:
+                    try:
+                        entries.append(json.loads(line))
+                        self.journal_entries += 1
+                    except ValueError:
+                        break # The game closed while this entry was being written
+        for room, key, value in entries:
+            self.progress[(room, decode_key(key))] = value
+
+        if self.thread == None:
+            self.thread = threading.Thread(target=self.run, name="SaveJournal", daemon=True)
+            self.thread.start()
+        return [(room, key, value) for (room, key), value in self.progress.items()]
+
+    def record(self, room, key, value):
+        """Save a room meta change, the change is written in the background"""
+        if self.thread != None:
+            self.queue.put((room, key, copy.deepcopy(value))) # Copied, so later changes to value can't race the thread
+
+    def reset(self):
+        """Clear all saved progress (for a new game)"""
+        if self.thread != None:
+            self.queue.put(RESET)
+
+    def close(self):
+        """Write every queued change, and stop the background thread"""
+        if self.thread != None:
+            self.queue.put(None)
+            self.thread.join()
+            self.thread = None
+
+    def run(self):
+        """Background thread, writes queued changes to the journal"""
+        with open(self.journal_path, "a") as journal:
+            if journal.tell() > 0:
+                self.compact(journal) # Start from an empty journal, so entries aren't added after a half written line
+            while True:
+                entry = self.queue.get()
+                entries = [entry]
+                # Write everything that is waiting together, then flush once
+                while not self.queue.empty():
+                    entries.append(self.queue.get())
+
+                for entry in entries:
+                    if entry == None:
+                        continue
+                    if entry is RESET:
+                        self.progress = {}
+                        self.compact(journal)
+                        continue
+                    room, key, value = entry
+                    self.progress[(room, key)] = value
+                    journal.write(json.dumps([room, encode_key(key), value]) + "\n")
+                    self.journal_entries += 1
+                journal.flush()
+                os.fsync(journal.fileno())
+
+                if self.journal_entries >= COMPACT_ENTRIES:
+                    self.compact(journal)
+                if None in entries:
+                    return
+
+    def compact(self, journal):
+        """Write the progress to the snapshot, and empty the journal"""
+        temporary = self.snapshot_path + ".tmp"
+        with open(temporary, "w") as f:
+            json.dump([[room, encode_key(key), value] for (room, key), value in self.progress.items()], f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, self.snapshot_path) # Replacing is atomic, so there is always a whole snapshot
+        journal.truncate(0)
+        journal.seek(0)
+        self.journal_entries = 0
@@ -0,0 +1,66 @@
+"""
+This file contains the texture atlas, which packs the images of a directory into a few large sheets.
+
+Every image in an atlas is a sub-surface of a sheet converted to the display format, so blitting
+them is faster than blitting separate surfaces, and they can be drawn together with Surface.blits().
+
+--+ Classes +--
+TextureAtlas(path) - Packs every PNG under a directory into sheets, with a lookup table of sub-surfaces
+"""
+# --------------------------------------------------------------------------------
+# External imports
+import pygame
+import os
+
+SHEET_SIZE = 1024 # Width and maximum height of a sheet
+
+class TextureAtlas():
+    """Packs every PNG under a directory into sheets, with a lookup table of sub-surfaces"""
+    def __init__(self, base_path, path):
+        """Load and pack the images under base_path + path, the display must exist to convert the sheets"""
+        self.path = path
+        self.sheets = []
+        self.images = {} # Sub-surfaces, keyed by image path (relative to base_path, normalized)
+
+        images = {}
+        for root, dirs, files in os.walk(base_path + path):
+            for name in files:
+                if name.endswith(".png"):
+                    image = pygame.image.load(os.path.join(root, name)).convert_alpha()
+                    images[os.path.normpath(os.path.relpath(os.path.join(root, name), base_path))] = image
+        self.pack(images)
+
+    def pack(self, images):
+        """Packs the images into sheets in rows (shelves), tallest images first"""
+        positions = {}
+        sheet_index = 0
+        x = y = row_height = 0
+        sheet_heights = [0]
+        for path in sorted(images, key=lambda path: (-images[path].get_height(), path)):
+            width, height = images[path].get_size()
+            if x + width > SHEET_SIZE:
+                # Start a new row
+                x = 0
+                y += row_height
+                row_height = 0
+            if y + height > SHEET_SIZE:
+                # Start a new sheet
+                sheet_index += 1
+                sheet_heights.append(0)
+                x = y = row_height = 0
+            positions[path] = (sheet_index, x, y)
+            x += width
+            row_height = max(row_height, height)
+            sheet_heights[sheet_index] = max(sheet_heights[sheet_index], y + height)
+
+        for height in sheet_heights:
+            self.sheets.append(pygame.Surface((SHEET_SIZE, max(1, height)), pygame.SRCALPHA).convert_alpha())
+            self.sheets[-1].fill((0, 0, 0, 0))
+        for path, (sheet_index, x, y) in positions.items():
+            # BLEND_RGBA_MAX onto the empty sheet copies the pixels exactly, including partly transparent ones
+            self.sheets[sheet_index].blit(images[path], (x, y), special_flags=pygame.BLEND_RGBA_MAX)
+            self.images[path] = self.sheets[sheet_index].subsurface((x, y, images[path].get_width(), images[path].get_height()))
+
+    def get(self, path):
+        """Returns the sub-surface for the image path, or None if it is not in the atlas"""
+        return self.images.get(path, None)
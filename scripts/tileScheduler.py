@@ -0,0 +1,79 @@
+"""
+This file contains the tile scheduler, which runs tile behaviour (timers, room state checks) only when it is due.
+
+A tile with an on_wake function is woken once after it is placed, then again after the number of simulation
+steps its on_wake returned (None to only wake it for state changes). Wake-ups are kept in a timer wheel, a ring
+of WHEEL_SIZE lists indexed by step, so each step only looks at the tiles due in that step's list. A tile is
+also woken when one of its wake_on room meta keys changes. Tiles are woken whether or not they are on screen,
+so their timers stay correct.
+
+on_wake(tile, tilemap, steps) gets the number of steps since the tile was last woken.
+
+--+ Classes +--
+TileScheduler() - Timer wheel and state watchers for the tiles of a room.
+"""
+# --------------------------------------------------------------------------------
+WHEEL_SIZE = 64 # Lists in the timer wheel, wake-ups further away wait in their list for the wheel to come around
+
+class TileScheduler():
+    """Timer wheel and state watchers for the tiles of a room."""
+    def __init__(self):
+        """Initialize variables for TileScheduler"""
+        self.step = 0 # Simulation steps run
+        self.wheel = [[] for i in range(WHEEL_SIZE)] # (due step, tile) wake-ups, in the list of step % WHEEL_SIZE
+        self.due = {} # Step each tile is next due, keyed by tile (wake-ups for any other step are cancelled)
+        self.last_wake = {} # Step each tile was last woken, keyed by tile
+        self.watchers = {} # Tiles woken when a room meta key changes, keyed by meta key
+
+    def add(self, tile):
+        """Start scheduling a tile that was placed in the tilemap, it is woken on the next step"""
+        if tile.on_wake == None:
+            return
+        self.last_wake[tile] = self.step
+        self.schedule(tile, 1)
+        for key in tile.wake_on:
+            self.watchers.setdefault(key, []).append(tile)
+
+    def schedule(self, tile, delay):
+        """Wake the tile after delay steps (replaces the tile's earlier wake-up)"""
+        due = self.step + max(1, int(delay))
+        self.due[tile] = due
+        self.wheel[due % WHEEL_SIZE].append((due, tile))
+
+    def update(self, tilemap):
+        """Run one simulation step, waking the tiles that are due"""
+        self.step += 1
+        index = self.step % WHEEL_SIZE
+        bucket = self.wheel[index]
+        if not bucket:
+            return
+        self.wheel[index] = [entry for entry in bucket if entry[0] != self.step]
+        for due, tile in bucket:
+            if due == self.step and self.due.get(tile) == due:
+                del self.due[tile]
+                self.wake(tile, tilemap)
+
+    def notify(self, key, tilemap):
+        """Wake the tiles watching the room meta key (Called when it changes)"""
+        for tile in list(self.watchers.get(key, [])):
+            if tilemap.get_tile(tile.pos) is not tile:
+                self.watchers[key].remove(tile) # The tile was replaced
+            else:
+                self.wake(tile, tilemap)
+
+    def wake(self, tile, tilemap):
+        """Run the tile's on_wake, and schedule its next wake-up"""
+        if tilemap.get_tile(tile.pos) is not tile:
+            # The tile was replaced, stop scheduling it
+            self.due.pop(tile, None)
+            self.last_wake.pop(tile, None)
+            return
+        steps = self.step - self.last_wake[tile]
+        self.last_wake[tile] = self.step
+        self.due.pop(tile, None) # Cancel a wake-up that is still waiting, on_wake sets the next one
+        if tile.hidden or tile.render_override != None:
+            self.schedule(tile, 1) # Hidden tiles don't run their behaviour, check again next step
+            return
+        delay = tile.on_wake(tile, tilemap, steps)
+        if delay != None and tilemap.get_tile(tile.pos) is tile:
+            self.schedule(tile, delay)
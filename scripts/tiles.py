@@ -5,18 +5,23 @@
 """
 This file contains the Tile object classes, used for creating tiles simply.
 
+Tile behaviour (timers, room state checks) is run by the tilemap's TileScheduler through on_wake, only when
+it is due, so rendering a tile only draws it.
+
 --+ Classes +-- 
 Tile() - Base tile
 """
 # --------------------------------------------------------------------------------
-from scripts.utils import blit
+from scripts.utils import blit, Animation
 
 class Tile():
     """Base class for tiles, stores tile details"""
-    def __init__(self, image, solid=False, meta={}, on_render=None, render_overide=None):
+    def __init__(self, image, solid=False, meta={}, on_render=None, render_overide=None, on_wake=None, wake_on=()):
         """Initialize values on initialization."""
         self.image = image
-        self.on_render = on_render
+        self.on_render = on_render # Ran every simulation step (prefer on_wake)
+        self.on_wake = on_wake # on_wake(tile, tilemap, steps), ran by the tile scheduler, returns the steps until it runs again
+        self.wake_on = wake_on # Room meta keys that also run on_wake when they change
         self.meta = meta # Meta can also be changed when loaded
         self.solid = solid
         self.hidden = False
@@ -29,6 +34,10 @@ class Tile():
 
     def render(self, disp, offset, tilesize, *args):
         """Render the tile given the tilesize and position"""
+        self.draw(disp, offset, tilesize, *args)
+
+    def draw(self, disp, offset, tilesize, *args):
+        """Draw the tile without running the on_render hook"""
         if not self.hidden and self.render_override == None:
             # If statements to check images upladed
             if type(self.image) == list:
@@ -41,20 +50,32 @@ class Tile():
                     self.pos[0]*tilesize-offset[0],
                     self.pos[1]*tilesize-offset[1]
                 ))
-            if self.on_render != None:
-                self.on_render(self, disp, offset, tilesize, *args)
         else:
             self.render_override(self, disp, offset, tilesize, *args)
 
+    def update(self, tilesize, *args):
+        """Run the on_render hook once per simulation step, without drawing"""
+        if not self.hidden and self.render_override == None and self.on_render != None:
+            self.on_render(self, None, (0, 0), tilesize, *args)
+
+    def is_static(self):
+        """Returns True if the tile will look the same every frame, allowing it to be pre-rendered"""
+        if type(self.image) == list:
+            image = self.image[self.variant]
+        else:
+            image = self.image
+        return (type(self) == Tile and not self.hidden and self.on_render == None
+                and self.render_override == None and type(image) != Animation)
+
     def copy(self):
         """Return a copy of the tile"""
-        return Tile(self.image, self.solid, self.meta, self.on_render)
+        return Tile(self.image, self.solid, self.meta, self.on_render, None, self.on_wake, self.wake_on)
 
 class InteractableTile(Tile):
     """Interactable tile, add interaction behaviour"""
-    def __init__(self, image, solid=False, meta={}, interaction=None, first_interaction=None, on_collision=None, interactable=True, collision_interactable=True, on_render=None, render_override=None):
+    def __init__(self, image, solid=False, meta={}, interaction=None, first_interaction=None, on_collision=None, interactable=True, collision_interactable=True, on_render=None, render_override=None, on_wake=None, wake_on=()):
         """Initialize values on initialization"""
-        super().__init__(image, solid, meta, on_render, render_override)
+        super().__init__(image, solid, meta, on_render, render_override, on_wake, wake_on)
         self.interactable = interactable
         self.collision_interactable = collision_interactable
         self.times_interacted = 0
@@ -93,7 +114,9 @@ class InteractableTile(Tile):
             self.interactable,
             self.collision_interactable,
             self.on_render,
-            self.render_override
+            self.render_override,
+            self.on_wake,
+            self.wake_on
         )
 
 class TileGroup():
@@ -0,0 +1,118 @@
+"""
+This file contains the upscaler, which scales the display up to the screen into a buffer that is made once.
+
+The filter is set with "upscale" in the display section of settings.json:
+    fit     - Largest 16:9 size that fits the screen, nearest neighbour (the scale can be a fraction).
+    integer - Largest whole number scale that fits the screen, nearest neighbour (every pixel is the same size).
+    scale2x - Whole number scale, using pygame's scale2x (smooths diagonal edges) then nearest neighbour.
+    smooth  - Same size as fit, using smoothscale (blurry, but no uneven pixels).
+
+Measure the throughput of each filter with:  python -m scripts.upscaler [--sizes 1920x1080 3840x2160]
+
+--+ Classes +--
+Upscaler(display, screen_size, mode) - Scales the display into a reused buffer with the chosen filter.
+"""
+# --------------------------------------------------------------------------------
+# External imports
+import argparse, math, os, random, time
+import pygame
+
+MODES = ('fit', 'integer', 'scale2x', 'smooth')
+
+def fit_size(screen_size):
+    """Returns the largest 16:9 size that fits in the screen"""
+    sWidth, sHeight = screen_size
+    if sWidth * 9 <= sHeight * 16: # The width limits the size (this used to check sWidth <= sHeight, which overflowed 16:10 screens)
+        dWidth = sWidth - (sWidth % 16)
+        dHeight = math.trunc(dWidth * (9/16))
+    else:
+        dHeight = sHeight - (sHeight % 9)
+        dWidth = math.trunc(dHeight * (16/9))
+    return (dWidth, dHeight)
+
+class Upscaler():
+    """Scales the display into a reused buffer with the chosen filter."""
+    def __init__(self, display, screen_size, mode='fit'):
+        """Initialize variables for Upscaler, and make the buffers for the mode (display is the surface that is scaled)"""
+        if mode not in MODES:
+            raise ValueError(f"Unknown upscale mode '{mode}', expected one of {MODES}")
+        display_size = display.get_size()
+        self.factor = min(screen_size[0] // display_size[0], screen_size[1] // display_size[1]) # Whole number scale
+        if mode in ('integer', 'scale2x') and self.factor < 1:
+            mode = 'fit' # The screen is smaller than the display
+        self.mode = mode
+
+        if mode in ('integer', 'scale2x'):
+            size = (display_size[0] * self.factor, display_size[1] * self.factor)
+        else:
+            size = fit_size(screen_size)
+        self.dest = pygame.Rect((screen_size[0] - size[0]) // 2, (screen_size[1] - size[1]) // 2, size[0], size[1])
+        self.buffer = pygame.Surface(size, 0, display) # Scaled display, in the display's format so it can be scaled into
+        self.scale = (size[0] / display_size[0], size[1] / display_size[1])
+        # Nearest neighbour with a whole number scale maps each row on its own, so parts of the display can be scaled
+        self.partial = mode != 'smooth' and mode != 'scale2x' and size[0] % display_size[0] == 0 and size[1] % display_size[1] == 0
+        # Rows of the buffer on each side of a changed part that a filter can also change
+        self.margin = 1 if mode == 'fit' else math.ceil(self.scale[1]) + 1
+
+        # Buffers for each doubling of scale2x
+        self.doubled = []
+        if mode == 'scale2x':
+            width, height = display_size
+            while width * 2 <= size[0] and height * 2 <= size[1]:
+                width, height = width * 2, height * 2
+                self.doubled.append(pygame.Surface((width, height), 0, display))
+            if self.doubled and self.doubled[-1].get_size() == size:
+                self.doubled[-1] = self.buffer # The last doubling is the final size, double straight into the buffer
+
+    def upscale(self, display, rows=None):
+        """Scale display into the buffer, only rows (first row, last row + 1) of the display if given and partial is True"""
+        if rows != None and self.partial:
+            start, end = rows
+            band = pygame.Rect(0, int(start * self.scale[1]), self.dest.width, int((end - start) * self.scale[1]))
+            pygame.transform.scale(display.subsurface((0, start, display.get_width(), end - start)), band.size, self.buffer.subsurface(band))
+            return band
+        if self.mode == 'smooth':
+            pygame.transform.smoothscale(display, self.dest.size, self.buffer)
+        elif self.mode == 'scale2x':
+            source = display
+            for surface in self.doubled:
+                pygame.transform.scale2x(source, surface)
+                source = surface
+            if source is not self.buffer:
+                pygame.transform.scale(source, self.dest.size, self.buffer)
+        else:
+            pygame.transform.scale(display, self.dest.size, self.buffer)
+        return self.buffer.get_rect()
+
+def benchmark(display, screen_size, frames=200):
+    """Returns the milliseconds each mode takes to scale the display to screen_size"""
+    results = {}
+    for mode in MODES:
+        upscaler = Upscaler(display, screen_size, mode)
+        start = time.perf_counter()
+        for frame in range(frames):
+            upscaler.upscale(display)
+        results[mode] = (time.perf_counter() - start) / frames * 1000
+    return results
+
+if __name__ == "__main__":
+    os.environ["SDL_VIDEODRIVER"] = "dummy"
+    parser = argparse.ArgumentParser(description="Measure how long each upscale mode takes.")
+    parser.add_argument('--sizes', nargs='*', default=['1280x720', '1920x1080', '2560x1440', '3840x2160'], help="screen sizes to scale to")
+    parser.add_argument('--frames', type=int, default=200, help="scales timed for each mode")
+    args = parser.parse_args()
+
+    pygame.init()
+    pygame.display.set_mode((1, 1))
+    # Random pixels, so no filter can take a shortcut
+    display = pygame.Surface((384, 216))
+    rng = random.Random(0)
+    for y in range(0, 216, 4):
+        for x in range(0, 384, 4):
+            display.fill((rng.randrange(256), rng.randrange(256), rng.randrange(256)), (x, y, 4, 4))
+
+    print("size       " + "".join(f"{mode:>12}" for mode in MODES) + "   (ms per scale, scales per second)")
+    for size in args.sizes:
+        screen_size = tuple(int(v) for v in size.split("x"))
+        results = benchmark(display, screen_size, args.frames)
+        print(f"{size:<11}" + "".join(f"{results[mode]:>7.2f}/{1000 / results[mode]:>4.0f}" for mode in MODES))
@@ -6,35 +6,71 @@
 This program contains many general-purpose classes and functions used throughout the program.
 
 --+ Classes +-- 
-Settings() - The settings class is used to load settings information from settings.json.
+Settings(headless) - The settings class is used to load settings information from settings.json.
 Animation(images, image_dur, loop = False) - The animation classs is used as a system to generalize the creation 
                                              of aniumations throughout the program.
+AnimationClock() - Clock that moves every Animation to the right frame, updated once per frame.
 Telemetry(active) - Simple class for tracking variables and displaying/changing telemetry data in console.
-GameManager() - The game manager class is used to manage and load save files.
+GameManager() - The game manager class is used to manage and load save files, and publishes room state changes.
+LazyAssets(loaders) - Dictionary of assets that are only loaded the first time they are used.
 
 --+ Functions +-- 
 load_image(path) - Loads the image at the given path, and returns it as a pygame image object.
 load_images(path) - Loads all images in given path and returns them as a list of pygame image objects.
-blit(surface, image, pos) - Simple replacment for blit, allows Animations to be passed in.
+convert_images() - Converts the loaded images to the display format, once the display exists.
+blit(surface, image, pos, layer) - Simple replacment for blit, allows Animations to be passed in, and uses the draw queue.
+draw_call(surface, function, layer) - Queues drawing that is not a blit (fills, shapes) in the draw queue.
+get_font(size, face) - Returns the shared pygame Font for a face and size.
+merge_rects(rects) - Returns the rects with overlapping rects joined together.
+set_font_target(surface) - Sets the surface render_font draws to, so a GUI element's text can be cached.
+render_text(text, size, color, face) - Returns the rendered text, only rendering text that is not in the text cache.
 
 --+ Variables +-- 
 BASE_IMAGE_PATH - Stores the base path were all images are stored.
-clear - Stores the function to clear the console for Telemetry Data.
+image_cache - Stores every loaded image by path, so each file is only loaded once.
+unconverted_images - Stores the paths of images loaded before the display existed.
+ATLAS_PATHS - Stores the image directories that are packed into texture atlases.
+atlases - Stores the TextureAtlas built for each directory in ATLAS_PATHS.
+draw_queue - Stores the DrawQueue used by blit() for the surfaces drawn each frame.
+animation_clock - Stores the AnimationClock that every Animation is registered with.
+font_cache - Stores every Font that was created, by (face, size).
+text_cache - Stores the most recently rendered text surfaces, by (text, size, color, face).
 
 """
 # --------------------------------------------------------------------------------
 # External imports
-from tkinter import Tk
+try:
+    from tkinter import Tk
+except ImportError: # Tk is only used to find the screen size in fullscreen mode
+    Tk = None
 import pygame
 import pygame.locals
 import json
 import os
+import weakref
+from collections import OrderedDict
+from collections.abc import Mapping
+
+# Internal imports
+from scripts.textureAtlas import TextureAtlas
+from scripts.saveJournal import SaveJournal
+from scripts.eventBus import EventBus, ROOM_COMPLETED, CHEST_OPENED, NOTE_CHECKED, ENEMY_KILLED, META_CHANGED
+from scripts.drawQueue import DrawQueue, LAYER_TILES, LAYER_HUD
 
 # Global variables
 BASE_IMAGE_PATH = "data/images/"
-clear = lambda: os.system('clear' if os.name == 'posix' else 'cls')
 screen = None
 display = None
+ATLAS_PATHS = ("tiles", "entities", "items") # Image directories packed into texture atlases
+image_cache = {}
+unconverted_images = set()
+atlases = {}
+draw_queue = DrawQueue() # Frame draw queue, the game sets the surfaces it draws to as targets
+FONT_FACE = 'freesansbold.ttf'
+TEXT_COLOR = (255, 250, 250)
+TEXT_CACHE_SIZE = 512 # Rendered text surfaces kept, the least recently used are dropped
+font_cache = {}
+text_cache = OrderedDict()
 # --------------------------------------------------------------------------------
 
 class GameManager():
@@ -49,24 +85,88 @@ class GameManager():
         self.tilemap = tilemap
         with open(save_file+'/rooms.json') as f:
             self.rooms = {int(k): v for k, v in json.load(f).items()}
+        # Apply the progress saved in the journal (opened chests, checked notes, completed rooms)
+        self.journal = SaveJournal(save_file, persistent=not game.settings.headless) # Benchmarks always start from a new game
+        for room, key, value in self.journal.load():
+            if room in self.rooms:
+                self.rooms[room].setdefault('meta', {})[key] = value
+        # Rooms that were left, keyed by room id, the least recently used room is first
+        self.room_cache = OrderedDict()
+        self.room_cache_size = game.settings.room_cache_size
+        self.room_cache_memory = game.settings.room_cache_memory * 1024 * 1024
         self.current_room = 0
+        # Room state changes are published on the event bus (see scripts/eventBus.py)
+        self.events = EventBus()
+        self.events.subscribe(META_CHANGED, lambda room, key, value: self.tilemap.tileScheduler.notify(key, self.tilemap)) # Wake the tiles that depend on it
+        self.events.subscribe(ENEMY_KILLED, self.on_enemy_killed)
+        self.events.subscribe(CHEST_OPENED, lambda room, pos: self.add_meta(pos, {'opened' : True}))
+        self.events.subscribe(NOTE_CHECKED, lambda room, pos: self.add_meta(pos, {'checked' : True}))
         self.tilemap.load(self.rooms[0]['room'], self) # Load tilemap
-        self.font = pygame.font.Font('freesansbold.ttf', int(12*game.scale[1]))
-        self.room_font = self.font.render(str(self.current_room), True, (255, 250, 250))
+        self.prefetch_neighbours()
+        self.font_size = int(12*game.scale[1])
+        self.room_font = render_text(str(self.current_room), self.font_size)
 
-    def set_room(self, room):
-        self.current_room = room
-        self.tilemap.load(self.rooms[room]['room'], self)
-        self.room_font = self.font.render(str(self.current_room), True, (255, 250, 250))
+    def set_room(self, room, reload=False):
+        self.load_room(room, reload)
+        self.room_font = render_text(str(self.current_room), self.font_size)
+        self.check_completed()
 
     def set_room_from_id(self, door_id):
-        self.current_room = int(self.rooms[self.current_room]['doors'][str(door_id)])
-        self.tilemap.load(self.rooms[ self.current_room ] ['room'], self)
-        self.room_font = self.font.render(str(self.current_room), True, (255, 250, 250))
+        self.load_room(int(self.rooms[self.current_room]['doors'][str(door_id)]))
+        self.room_font = render_text(str(self.current_room), self.font_size)
+
+    def load_room(self, room, reload=False):
+        """Switch the tilemap to room, restoring it from the room cache if it was visited recently (unless reload is True)"""
+        if room == self.current_room:
+            reload = True # Setting the room that is loaded (respawning) starts it again
+        else:
+            # Keep the room being left, so coming back to it keeps opened chests, enemies, etc.
+            self.room_cache[self.current_room] = self.tilemap.get_state()
+            self.room_cache.move_to_end(self.current_room)
+
+        self.current_room = room
+        state = self.room_cache.pop(room, None)
+        if state != None and not reload:
+            self.tilemap.set_state(state)
+        else:
+            self.tilemap.load(self.rooms[room]['room'], self)
+
+        # Evict the least recently used rooms
+        memory = sum(self.tilemap.state_memory(state) for state in self.room_cache.values())
+        while self.room_cache and (len(self.room_cache) > self.room_cache_size or memory > self.room_cache_memory):
+            memory -= self.tilemap.state_memory(self.room_cache.popitem(last=False)[1])
+        self.prefetch_neighbours()
+
+    def check_completed(self):
+        """Complete the current room if it has no enemies (Called after a room is entered)"""
+        if not self.tilemap.enemyManager.enemies:
+            self.complete_room()
+
+    def on_enemy_killed(self, enemy, remaining):
+        """Complete the current room when its last enemy is killed"""
+        if remaining <= 0:
+            self.complete_room()
+
+    def complete_room(self):
+        """Mark the current room as completed, and publish ROOM_COMPLETED the first time"""
+        if self.get_meta('completed') != True:
+            self.add_meta('completed', True)
+            self.events.publish(ROOM_COMPLETED, self.current_room)
+
+    def prefetch_neighbours(self):
+        """Start reading the rooms the doors of the current room lead to, so they load without a hitch"""
+        doors = self.rooms[self.current_room].get('doors', {})
+        self.tilemap.roomLoader.prefetch([self.rooms[int(room)]['room'] for room in doors.values()
+                                          if int(room) in self.rooms and int(room) not in self.room_cache])
 
     def add_meta(self, key, value):
-        """Add a key-value pair to room meta-data"""
-        self.rooms[self.current_room].get('meta', {})[key] = value
+        """Add a key-value pair to room meta-data, and save it"""
+        meta = self.rooms[self.current_room].setdefault('meta', {})
+        if key in meta and meta[key] == value:
+            return # Nothing changed
+        meta[key] = value
+        self.journal.record(self.current_room, key, value)
+        self.events.publish(META_CHANGED, self.current_room, key, value)
 
     def get_meta(self, key):
         """Get value from room meta-deta"""
@@ -75,8 +175,9 @@ class GameManager():
 
 class Settings():
 
-    def __init__(self):
+    def __init__(self, headless=False):
         """Initialize variables with information relevent throughout the program, as well as manage the settings file"""
+        self.headless = headless # When headless, nothing is shown and the screen size is always the resolution
         
         settingsJSON = open("data/settings.json",
                             "r")  # open the JSON file for settings
@@ -85,7 +186,7 @@ class Settings():
         settingsJSON.close()  # Close JSON file
 
         if self.settings_data['display'][
-                'fullscreen']:  # Check is fullscreen is enabled
+                'fullscreen'] and not headless and Tk != None:  # Check is fullscreen is enabled
             root = Tk()
             self.screen_size = (
                 root.winfo_screenwidth(), root.winfo_screenheight()
@@ -94,6 +195,7 @@ class Settings():
             self.screen_size = (self.settings_data['display']['resolution'][0],
                                 self.settings_data['display']['resolution'][1]
                                 )  # Set screen to size from settings.json
+        self.upscale = self.settings_data['display'].get('upscale', 'fit') # Filter used to scale the game to the screen (see scripts/upscaler.py)
             
 
         # Assign keybinds from settings
@@ -104,11 +206,25 @@ class Settings():
                 pygame.locals, "K_" + self.settings_data["keybinds"][key]
             )  # set the keybind value to the pygame key attribute that corrosponds the value from settings.json using getattr()
 
+        # Set performance settings
+        performance = self.settings_data.get('performance', {})
+        self.room_cache_size = performance.get('room-cache-size', 8) # Number of rooms kept in memory after leaving them
+        self.room_cache_memory = performance.get('room-cache-memory', 64) # Megabytes of room state (pre-rendered tiles, tiles, enemies) kept for those rooms
+        self.simulation_rate = performance.get('simulation-rate', 60) # Simulation steps per second, independent of the frame rate
+        self.render_mode = performance.get('render-mode', 'capped') # 'capped' (max-fps), 'uncapped' or 'vsync'
+        self.max_fps = performance.get('max-fps', 60) # Frame limit for the 'capped' render mode
+        self.ai_budget = performance.get('ai-budget', 2) # Milliseconds enemies can spend thinking each simulation step (0 for no limit)
+        self.ai_far_interval = performance.get('ai-far-interval', 8) # Steps between thinks for enemies away from the view
+
         # Set developer Settings
         if self.settings_data['developer']['developer']:
             self.telemetry = self.settings_data['developer']['telemetry']
+            self.profiler = self.settings_data['developer'].get('profiler', False) # Time each phase of the frame, F3 toggles the overlay
+            self.profiler_trace = self.settings_data['developer'].get('profiler-trace', None) # Chrome trace file written on exit
         else:
             self.telemetry = False
+            self.profiler = False
+            self.profiler_trace = None
 
 
 class DisplayPositions:
@@ -133,25 +249,24 @@ class Telemetry:
         self.telemetry_data = {}
         self.telemetry_log = []
         self.active = active
+        self.last_output = [] # Last printed lines, the data is only printed again when it changes
 
     def add(self, key, value):
         """Adds the given key and value to the telemetry values"""
         self.telemetry_data[key] = value
 
     def update(self):
-        """Clears the screen and displays the telemetry data"""
+        """Prints the telemetry data when it has changed (the values are also shown in the profiler overlay)"""
         if self.active:
-            clear()
-            for k, v in self.telemetry_data.items():
-                print(f"{k}: {v}")
+            output = [f"{k}: {v}" for k, v in self.telemetry_data.items()]
+            output.append("\nTelemetry Log:")
+            output.extend(f"  {item}" for item in reversed(self.telemetry_log))
+            if output != self.last_output:
+                print("\n".join(output))
+                self.last_output = output
 
             self.telemetry_data = {}
 
-            # Print persistent data to screen
-            print("\nTelemetry Log:")
-            for item in reversed(self.telemetry_log):
-                print(" ", item)
-
     def remove(self, key):
         """Removes given key from telemetry data"""
         self.telemetry_data.pop(key, None)
@@ -164,9 +279,30 @@ class Telemetry:
 
 
 def load_image(path):
-    """Loads the image at the given path, and returns it as a pygame image object."""
-    return pygame.image.load(BASE_IMAGE_PATH +
-                             path)  # returns the loaded pygame image object
+    """Loads the image at the given path, and returns it as a pygame image object (the same object for every call)."""
+    path = os.path.normpath(path)
+    if path not in image_cache:
+        image = None
+        if pygame.display.get_surface() != None:
+            atlas_path = path.split(os.sep)[0]
+            if atlas_path in ATLAS_PATHS:
+                # Images in these directories are sub-surfaces of a texture atlas, built on first use
+                if atlas_path not in atlases:
+                    atlases[atlas_path] = TextureAtlas(BASE_IMAGE_PATH, atlas_path)
+                image = atlases[atlas_path].get(path)
+            if image == None:
+                image = pygame.image.load(BASE_IMAGE_PATH + path).convert_alpha() # Convert to the display format, so it is faster to blit
+        else:
+            image = pygame.image.load(BASE_IMAGE_PATH + path)
+            unconverted_images.add(path)
+        image_cache[path] = image
+    return image_cache[path]
+
+def convert_images():
+    """Converts images that were loaded before the display existed, later calls to load_image() return the converted images."""
+    for path in unconverted_images:
+        image_cache[path] = image_cache[path].convert_alpha()
+    unconverted_images.clear()
 
 def convert_time(seconds):
     seconds = seconds % (24 * 3600)
@@ -178,17 +314,68 @@ def convert_time(seconds):
     return "%d:%02d:%02d" % (hour, minutes, seconds)
 
 
-def blit(surface, image, pos):
+def blit(surface, image, pos, layer=LAYER_TILES):
+    """Simple replacment for blit, allows Animations to be passed in. Surfaces drawn through the draw queue are drawn on flush."""
     if image == None:
-        pass
-    elif type(image) == Animation:
-        surface.blit(image.tick(), pos)
+        return
+    if type(image) == Animation:
+        image = image.frames[image.frame_index]
+    if surface in draw_queue.targets:
+        draw_queue.add(surface, image, pos, layer)
     else:
         surface.blit(image, pos)
 
+def draw_call(surface, function, layer):
+    """Calls function with surface for drawing that is not a blit, queued if the surface is drawn through the draw queue."""
+    if surface in draw_queue.targets:
+        draw_queue.add_call(surface, function, layer)
+    else:
+        function(surface)
+
+def get_font(size, face=FONT_FACE):
+    """Returns the Font for face and size, each one is only created once."""
+    size = int(size)
+    if (face, size) not in font_cache:
+        font_cache[(face, size)] = pygame.font.Font(face, size)
+    return font_cache[(face, size)]
+
+def render_text(text, size, color=TEXT_COLOR, face=FONT_FACE):
+    """Returns text rendered (antialiased) with the font for face and size, text that was rendered recently is reused."""
+    key = (text, int(size), color, face)
+    surface = text_cache.get(key)
+    if surface == None:
+        surface = get_font(size, face).render(text, True, color)
+        text_cache[key] = surface
+        if len(text_cache) > TEXT_CACHE_SIZE:
+            text_cache.popitem(last=False)
+    else:
+        text_cache.move_to_end(key)
+    return surface
+
+def set_font_target(surface):
+    """Sets the surface render_font() draws to (the same size as the font screen), returns the previous one."""
+    global screen
+    previous = screen
+    screen = surface
+    return previous
+
+def merge_rects(rects):
+    """Returns the rects with overlapping rects joined together (so no area is drawn twice)"""
+    merged = []
+    for rect in rects:
+        if rect.width <= 0 or rect.height <= 0:
+            continue
+        rect = rect.copy()
+        index = rect.collidelist(merged)
+        while index != -1:
+            rect.union_ip(merged.pop(index))
+            index = rect.collidelist(merged)
+        merged.append(rect)
+    return merged
+
 def render_font(font, scale, pos):
     """Poorly made hack to fix the low resolution font rendering"""
-    blit(screen, font, (pos[0]*scale[0] + ((screen.get_width()/2)-(display[0]/2)), pos[1]*scale[1] + ((screen.get_height()/2)-(display[1]/2))))
+    blit(screen, font, (pos[0]*scale[0] + ((screen.get_width()/2)-(display[0]/2)), pos[1]*scale[1] + ((screen.get_height()/2)-(display[1]/2))), LAYER_HUD)
 
 def load_images(path):
     """Loads all images in given path and returns them as a list of pygame surface objects (can also be Animation objects)."""
@@ -202,31 +389,63 @@ def load_images(path):
     return images  # Return the list of pygame image objects
 
 
+class LazyAssets(Mapping):
+    """Dictionary of assets that are only loaded the first time they are used, values are given as functions that load them"""
+
+    def __init__(self, loaders):
+        """Initialize with a dictionary of functions that load each asset"""
+        self.loaders = loaders
+        self.loaded = {}
+
+    def __getitem__(self, key):
+        if key not in self.loaded:
+            self.loaded[key] = self.loaders[key]()
+        return self.loaded[key]
+
+    def __contains__(self, key):
+        return key in self.loaders
+
+    def __iter__(self):
+        return iter(self.loaders)
+
+    def __len__(self):
+        return len(self.loaders)
+
+
+class AnimationClock():
+    """Clock that moves every Animation to the right frame, updated once per frame from the game loop"""
+
+    def __init__(self):
+        """Initialize the clock"""
+        self.time = 0  # Seconds since the clock started
+        self.animations = weakref.WeakSet()  # Registered animations, removed when they are no longer used
+
+    def register(self, animation):
+        """Register an animation, so it is updated by the clock"""
+        self.animations.add(animation)
+        animation.frame_index = int(self.time * animation.fps) % max(1, len(animation.frames))
+
+    def update(self, dt):
+        """Advance the clock by dt seconds, and set the frame of every registered animation"""
+        self.time += dt
+        for animation in self.animations:
+            animation.frame_index = int(self.time * animation.fps) % max(1, len(animation.frames))
+
+animation_clock = AnimationClock() # Clock for every Animation, updated by the game loop
+
+
 class Animation():
     """Animation object, stores frames and is ued for animated images"""
 
     def __init__(self, frames, fps=5):
         """Initialize variables needed for animation"""
         self.frames = frames
-        self.frame_index = 0  # Current frame
+        self.frame_index = 0  # Current frame, set by the animation clock
         self.fps = fps
-        self.current_tick = 0  # Current tick
-        self.frame_time = 60 / fps  # Calculate the time between frames in game ticks
+        animation_clock.register(self)
 
     def tick(self):
-        """Increment the animation one tick, returns current frame"""
-        # Increment current tick
-        if self.current_tick >= self.frame_time:
-            self.current_tick = 0
-            # Increment to the next frame index
-            if self.frame_index < len(self.frames) - 1:
-                self.frame_index += 1
-            else:
-                # Reset frame back to beginning
-                self.frame_index = 0
-        else:
-            self.current_tick += 1
-
+        """Returns current frame (frames are advanced by the animation clock, not by drawing)"""
         return self.frames[self.frame_index]
 
     def current_frame(self):
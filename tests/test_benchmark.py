@@ -0,0 +1,36 @@
+"""
+Tests for the headless benchmark, run from the project directory with:  python -m pytest tests
+"""
+# --------------------------------------------------------------------------------
+# External imports
+import os, sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT) # The game loads its data relative to the project directory
+
+# Internal imports
+from scripts.benchmark import Benchmark
+
+def run_states(ticks=60, think_cost=0.00002):
+    """Run the benchmark in every room, returns the state of the game after each room, and the AI scheduler counts"""
+    benchmark = Benchmark(ticks=ticks, think_cost=think_cost)
+    states = []
+    for room in sorted(benchmark.game.gameManager.rooms):
+        benchmark.run([room])
+        states.append(benchmark.state())
+    return states, benchmark.game.tilemap.aiScheduler.stats()
+
+def test_benchmark_is_deterministic():
+    """Two runs with the same arguments end every room in the same state"""
+    first, stats = run_states()
+    second, _ = run_states()
+    assert any(state['enemies'] for state in first) # Enemies were simulated
+    assert first == second
+
+def test_benchmark_is_deterministic_over_ai_budget():
+    """Runs stay the same when the AI budget puts thinks off (thinks are timed on a simulated clock)"""
+    first, stats = run_states(think_cost=0.0009)
+    second, _ = run_states(think_cost=0.0009)
+    assert stats['ai deferred thinks'] > 0
+    assert first == second